@@ -8,6 +8,7 @@ from alembic import context
 from app.database import Base
 from app.users.models import User
 from app.adv.models import Adv
+from app.jobs.models import BackgroundJob
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,32 @@
+"""adv comment version added
+
+Revision ID: c3f1a7d92e54
+Revises: b84e2f06d1c3
+Create Date: 2026-10-18 14:05:12.417930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a7d92e54'
+down_revision: Union[str, None] = 'b84e2f06d1c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('advertisement', 'comment'):
+        op.add_column(table, sa.Column('version', sa.Integer(),
+                                       server_default='1', nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True),
+                                       server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    for table in ('advertisement', 'comment'):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
@@ -0,0 +1,32 @@
+"""adv list indexes added
+
+Revision ID: 3f1c2a9b7d40
+Revises: d0632c8c1122
+Create Date: 2026-10-18 09:02:11.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d40'
+down_revision: Union[str, None] = 'd0632c8c1122'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_advertisement_is_active_id', 'advertisement',
+                    ['is_active', 'id'], unique=False)
+    op.create_index('ix_advertisement_is_active_group_id', 'advertisement',
+                    ['is_active', 'group', 'id'], unique=False)
+    op.create_index('ix_advertisement_author_id_id', 'advertisement',
+                    ['author_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_advertisement_author_id_id', table_name='advertisement')
+    op.drop_index('ix_advertisement_is_active_group_id', table_name='advertisement')
+    op.drop_index('ix_advertisement_is_active_id', table_name='advertisement')
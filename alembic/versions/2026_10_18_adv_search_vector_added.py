@@ -0,0 +1,36 @@
+"""adv search vector added
+
+Revision ID: 8c5e0d4a61b2
+Revises: 3f1c2a9b7d40
+Create Date: 2026-10-18 09:31:47.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c5e0d4a61b2'
+down_revision: Union[str, None] = '3f1c2a9b7d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('advertisement',
+                  sa.Column('search_vector', postgresql.TSVECTOR(),
+                            sa.Computed("to_tsvector('simple', "
+                                        "coalesce(title, '') || ' ' || coalesce(body, ''))",
+                                        persisted=True),
+                            nullable=True))
+    op.create_index('ix_advertisement_search_vector', 'advertisement',
+                    ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_advertisement_search_vector', table_name='advertisement',
+                  postgresql_using='gin')
+    op.drop_column('advertisement', 'search_vector')
@@ -0,0 +1,25 @@
+"""comment adv index added
+
+Revision ID: 5a9d13e7c2f6
+Revises: e27b9f3c0a18
+Create Date: 2026-10-18 11:04:52.617390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9d13e7c2f6'
+down_revision: Union[str, None] = 'e27b9f3c0a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_comment_adv_id_id', 'comment', ['adv_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comment_adv_id_id', table_name='comment')
@@ -0,0 +1,25 @@
+"""comment author index added
+
+Revision ID: b84e2f06d1c3
+Revises: 5a9d13e7c2f6
+Create Date: 2026-10-18 12:21:37.904116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b84e2f06d1c3'
+down_revision: Union[str, None] = '5a9d13e7c2f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_comment_author_id_id', 'comment', ['author_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comment_author_id_id', table_name='comment')
@@ -0,0 +1,27 @@
+"""user token version added
+
+Revision ID: e27b9f3c0a18
+Revises: 8c5e0d4a61b2
+Create Date: 2026-10-18 10:12:05.331872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e27b9f3c0a18'
+down_revision: Union[str, None] = '8c5e0d4a61b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('token_version', sa.Integer(),
+                                    server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'token_version')
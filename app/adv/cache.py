@@ -0,0 +1,179 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Hashable, Iterable, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.adv.models import Group
+from app.cache import SizedLRUCache, invalidation_listener, notify
+from app.config import settings
+from app.database import replica_engines
+from app.serialization import RawJSONResponse
+
+# Postgres channel of comma-separated IDs of changed advertisements, every
+# worker listens to it and drops responses depending on them
+INVALIDATION_CHANNEL = "adv_cache_invalidation"
+# Max number of IDs in one notification, payloads are limited to 8000 bytes
+NOTIFY_BATCH_SIZE = 500
+# Invalidations are remembered for this long plus the replica lag
+# window to reject responses read before them, at most this many ones
+INVALIDATION_HISTORY_SECONDS = 60
+INVALIDATION_HISTORY_SIZE = 10000
+
+
+@dataclass(slots=True, frozen=True)
+class CachedResponse:
+    """Serialized body of a response with its ETag"""
+    body: bytes
+    etag: str | None = None
+
+    def response(self) -> RawJSONResponse:
+        return RawJSONResponse(self.body, headers={"ETag": self.etag} if self.etag else None)
+
+
+class AdvResponseCache:
+    """Size-aware LRU cache of serialized responses with an advertisement
+    and of first pages of the list. A response with an Adv depends only on
+    it, a first page depends on Advs with IDs up to its bound, the ID of
+    the row after the page, or on all of them if there is no such row.
+    A change of an Adv drops the responses depending on it.
+
+    Responses are cached only while the worker listens to invalidations
+    of other workers, and a response is not cached if an Adv it depends
+    on has changed since its read has started, or within the replica lag
+    window before it"""
+    def __init__(self, max_bytes: int, settle_seconds: float):
+        self.responses = SizedLRUCache(max_bytes)
+        self.settle_seconds = settle_seconds
+        self.listening = False
+        # Bounds of cached pages by their keys, None for unbounded ones
+        self._page_bounds: dict[Hashable, int | None] = {}
+        # Times and IDs of recent invalidations, oldest first
+        self._history: deque[tuple[float, int]] = deque()
+        self._forgotten_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.listening and self.responses.max_bytes > 0
+
+    @staticmethod
+    def adv_key(adv_id: int) -> tuple:
+        return "adv", adv_id
+
+    @staticmethod
+    def page_key(limit: int, group: Group | None, author_id: int | None, is_active: bool) -> tuple:
+        return "page", limit, group, author_id, is_active
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        """Return a cached response or None if it is missing or caching is off"""
+        if not self.enabled:
+            return None
+        return self.responses.get(key)
+
+    def set_adv(self, adv_id: int, cached: CachedResponse, started: float) -> None:
+        """Cache a response with the Adv
+        Parameters
+        ----------
+        adv_id :
+            ID of the Adv
+        cached :
+            Serialized response
+        started :
+            time.monotonic() before the Adv has been read
+        """
+        if self.enabled and not self._changed_since(started, lambda changed_id: changed_id == adv_id):
+            self.responses.set(self.adv_key(adv_id), cached, len(cached.body))
+
+    def set_page(self, key: Hashable, cached: CachedResponse, bound: int | None, started: float) -> None:
+        """Cache a first page of the list
+        Parameters
+        ----------
+        key :
+            Key of the page returned by page_key
+        cached :
+            Serialized response
+        bound :
+            ID of the Adv read after the last one of the page, None if there is no such Adv
+        started :
+            time.monotonic() before the page has been read
+        """
+        if self.enabled and not self._changed_since(
+                started, lambda changed_id: bound is None or changed_id <= bound):
+            self.responses.set(key, cached, len(cached.body))
+            self._page_bounds[key] = bound
+
+    def _changed_since(self, started: float, depends_on) -> bool:
+        since = started - self.settle_seconds
+        if since <= self._forgotten_at:
+            return True
+        for changed_at, adv_id in reversed(self._history):
+            if changed_at < since:
+                return False
+            if depends_on(adv_id):
+                return True
+        return False
+
+    def invalidate(self, adv_ids: Iterable[int]) -> None:
+        """Drop responses depending on the changed Advs"""
+        now = time.monotonic()
+        lowest = None
+        for adv_id in adv_ids:
+            self._remember(now, adv_id)
+            self.responses.invalidate(self.adv_key(adv_id))
+            lowest = adv_id if lowest is None else min(lowest, adv_id)
+        if lowest is None:
+            return
+        for key, bound in list(self._page_bounds.items()):
+            if key not in self.responses:
+                del self._page_bounds[key]
+            elif bound is None or bound >= lowest:
+                self.responses.invalidate(key)
+                del self._page_bounds[key]
+
+    def _remember(self, now: float, adv_id: int) -> None:
+        history = self._history
+        while history and (len(history) >= INVALIDATION_HISTORY_SIZE or
+                           history[0][0] < now - self.settle_seconds - INVALIDATION_HISTORY_SECONDS):
+            self._forgotten_at = max(self._forgotten_at, history.popleft()[0])
+        history.append((now, adv_id))
+
+    def clear(self) -> None:
+        """Drop all responses and reject the ones being read now"""
+        self.responses.clear()
+        self._page_bounds.clear()
+        self._history.clear()
+        self._forgotten_at = time.monotonic()
+
+
+# Cache of this worker process, RESPONSE_CACHE_BYTES=0 disables it
+adv_cache = AdvResponseCache(settings.RESPONSE_CACHE_BYTES,
+                             settings.READ_YOUR_WRITES_SECONDS if replica_engines else 0)
+
+
+async def publish_invalidation(session: AsyncSession, adv_ids: Sequence[int]) -> None:
+    """Notify all workers about changed Advs. Notifications are delivered
+    when the transaction of the session is committed
+    Parameters
+    ----------
+    session :
+        Session of the transaction changing the Advs
+    adv_ids :
+        IDs of the changed Advs
+    """
+    if settings.RESPONSE_CACHE_BYTES <= 0:
+        return
+    for start in range(0, len(adv_ids), NOTIFY_BATCH_SIZE):
+        payload = ",".join(str(adv_id) for adv_id in adv_ids[start:start + NOTIFY_BATCH_SIZE])
+        await notify(session, INVALIDATION_CHANNEL, payload)
+
+
+def _on_notification(payload: str) -> None:
+    adv_cache.invalidate(int(adv_id) for adv_id in payload.split(","))
+
+
+def _on_listening(listening: bool) -> None:
+    if listening:
+        adv_cache.clear()
+    adv_cache.listening = listening
+
+
+invalidation_listener.subscribe(INVALIDATION_CHANNEL, _on_notification, _on_listening)
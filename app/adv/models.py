@@ -1,11 +1,17 @@
 import enum
-from sqlalchemy import BigInteger, Enum, Boolean, String, ForeignKey, Integer
+from datetime import datetime
+from sqlalchemy import BigInteger, Enum, Boolean, String, ForeignKey, Integer, Index, Computed, DateTime, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.comments.models import Comment
 from app.database import Base
 from app.users.models import User
 
 
+# Text search configuration used to index and query advertisements
+SEARCH_CONFIG = "simple"
+
+
 class Group(str, enum.Enum):
     """List of available adv groups"""
     SELLING_ADV = "SELL"
@@ -22,9 +28,28 @@ class Adv(Base):
     author_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id", ondelete="CASCADE"))
     group: Mapped[str] = mapped_column(Enum(Group, name="group"), default=Group.SELLING_ADV)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Incremented and set on every change of the row, version is a part of ETag
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', "
+                 f"coalesce(title, '') || ' ' || coalesce(body, ''))", persisted=True),
+        deferred=True
+    )
+
+    # Relationships are never loaded implicitly, queries set loader options if they need them
+    author: Mapped[User] = relationship("User", lazy="raise", back_populates="advertisements")
+    comments: Mapped[Comment] = relationship("Comment", lazy="raise", back_populates="adv")
 
-    author: Mapped[User] = relationship("User", lazy="selectin", back_populates="advertisements")
-    comments: Mapped[Comment] = relationship("Comment", back_populates="adv")
+    # Composite indexes to serve filtered pages of the list by index range scans
+    # and GIN index for full-text search
+    __table_args__ = (
+        Index("ix_advertisement_is_active_id", "is_active", "id"),
+        Index("ix_advertisement_is_active_group_id", "is_active", "group", "id"),
+        Index("ix_advertisement_author_id_id", "author_id", "id"),
+        Index("ix_advertisement_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     def __repr__(self) -> str:
-        return f"Adv(id={self.id}, title={self.title}, author={self.author.username})"
+        return f"Adv(id={self.id}, title={self.title}, author_id={self.author_id})"
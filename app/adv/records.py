@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+from app.adv.models import Group
+
+
+@dataclass(slots=True, frozen=True)
+class AdvRecord:
+    """Read-only row of an advertisement without ORM state"""
+    id: int
+    title: str
+    body: str | None
+    author_id: int
+    group: Group
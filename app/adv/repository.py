@@ -1,9 +1,15 @@
-from typing import Sequence
-from sqlalchemy import select, update, delete
+from typing import AsyncIterator, Sequence
+from sqlalchemy import Row, Select, select, update, delete, exists, func, or_, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import Adv
+from app.adv.cache import adv_cache, publish_invalidation
+from app.adv.models import Group, SEARCH_CONFIG
+from app.adv.records import AdvRecord
 from app.adv.schemas import AdvCreate, AdvUpdate
 
+# Columns of AdvRecord in the order of its fields
+ADV_RECORD_COLUMNS = (Adv.id, Adv.title, Adv.body, Adv.author_id, Adv.group)
+
 
 class AdvRepository:
     def __init__(self, session: AsyncSession):
@@ -30,6 +36,18 @@ class AdvRepository:
         self.session.add(new_adv)
         return new_adv
 
+    async def save(self, adv: Adv) -> None:
+        """Commit a new Adv instance and drop cached pages it appears on
+        Parameters
+        ----------
+        adv :
+            A new instance of the Adv class returned by 'create'
+        """
+        await self.session.flush()
+        await publish_invalidation(self.session, [adv.id])
+        await self.session.commit()
+        adv_cache.invalidate([adv.id])
+
     async def read(self, adv_id: int) -> Adv:
         """Return an Adv instance by its ID from DB
         Parameters
@@ -46,56 +64,278 @@ class AdvRepository:
         result = await self.session.execute(query)
         return result.scalar()
 
-    async def read_all(self) -> Sequence[Adv]:
-        """Return list of all Adv instances
+    async def read_all(self,
+                       limit: int,
+                       after_id: int | None = None,
+                       group: Group | None = None,
+                       author_id: int | None = None,
+                       is_active: bool = True) -> Sequence[Adv]:
+        """Return a page of Adv instances ordered by ID
+        Parameters
+        ----------
+        limit :
+            Max number of Adv instances to return
+        after_id :
+            ID of the last Adv on the previous page, first page if None
+        group :
+            Return only Adv instances of the Group if set
+        author_id :
+            Return only Adv instances of the author if set
+        is_active :
+            Return only active or only deactivated Adv instances
+
         Returns
         -------
         Adv :
-            All instances of the Adv class from database
+            Instances of the Adv class from database with ID greater than 'after_id'
         """
-        query = select(Adv)
+        query = self._page_query(select(Adv), limit, after_id, group, author_id, is_active)
         result = await self.session.execute(query)
         return result.scalars().all()
 
+    async def read_records(self,
+                           limit: int,
+                           after_id: int | None = None,
+                           group: Group | None = None,
+                           author_id: int | None = None,
+                           is_active: bool = True) -> list[AdvRecord]:
+        """Return a page of advertisements as read-only records ordered by ID.
+        Only viewed columns are selected and no ORM instances are built
+        Parameters
+        ----------
+        limit :
+            Max number of records to return
+        after_id :
+            ID of the last Adv on the previous page, first page if None
+        group :
+            Return only Adv records of the Group if set
+        author_id :
+            Return only Adv records of the author if set
+        is_active :
+            Return only active or only deactivated Adv records
+
+        Returns
+        -------
+        AdvRecord :
+            Records of advertisements with ID greater than 'after_id'
+        """
+        query = self._page_query(select(*ADV_RECORD_COLUMNS), limit, after_id, group, author_id, is_active)
+        result = await self.session.execute(query)
+        return [AdvRecord(*row) for row in result]
+
+    @staticmethod
+    def _page_query(query: Select,
+                    limit: int,
+                    after_id: int | None,
+                    group: Group | None,
+                    author_id: int | None,
+                    is_active: bool) -> Select:
+        """Add filters, order and limit of a page of advertisements to the query"""
+        query = query.\
+            where(Adv.is_active == is_active).\
+            order_by(Adv.id).\
+            limit(limit)
+        if after_id is not None:
+            query = query.where(Adv.id > after_id)
+        if group is not None:
+            query = query.where(Adv.group == group)
+        if author_id is not None:
+            query = query.where(Adv.author_id == author_id)
+        return query
+
+    async def search(self,
+                     text: str,
+                     limit: int,
+                     after: tuple[float, int] | None = None) -> Sequence[Row]:
+        """Return a page of active Adv rows matching the text ordered by rank
+        Parameters
+        ----------
+        text :
+            Search query in web search syntax (e.g. 'bike -kids "red color"')
+        limit :
+            Max number of rows to return
+        after :
+            Rank and ID of the last Adv on the previous page, first page if None
+
+        Returns
+        -------
+        Row :
+            Rows with Adv columns and 'rank' of the match, best matches first
+        """
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, text)
+        rank = func.ts_rank(Adv.search_vector, ts_query)
+        query = select(Adv.id, Adv.title, Adv.body, Adv.author_id, Adv.group,
+                       rank.label("rank")).\
+            where(Adv.search_vector.bool_op("@@")(ts_query), Adv.is_active).\
+            order_by(rank.desc(), Adv.id).\
+            limit(limit)
+        if after is not None:
+            after_rank, after_id = after
+            query = query.where(or_(rank < after_rank,
+                                    and_(rank == after_rank, Adv.id > after_id)))
+        result = await self.session.execute(query)
+        return result.all()
+
+    async def stream_all(self, batch_size: int) -> AsyncIterator[Row]:
+        """Iterate over all Adv rows ordered by ID using a server-side cursor
+        Parameters
+        ----------
+        batch_size :
+            Number of rows fetched from the cursor at once
+
+        Returns
+        -------
+        Row :
+            Rows with columns of the Adv table
+        """
+        query = select(Adv.id, Adv.title, Adv.body, Adv.author_id, Adv.group, Adv.is_active).\
+            order_by(Adv.id).\
+            execution_options(yield_per=batch_size)
+        result = await self.session.stream(query)
+        async for row in result:
+            yield row
+
+    async def read_version(self, adv_id: int) -> int | None:
+        """Return version of an Adv instance without loading it
+        Parameters
+        ----------
+        adv_id :
+            ID of Adv instance
+
+        Returns
+        -------
+        int :
+            Version of the Adv, None if it doesn't exist
+        """
+        query = select(Adv.version).where(Adv.id == adv_id)
+        result = await self.session.execute(query)
+        return result.scalar()
+
+    async def exists(self, adv_id: int) -> bool:
+        """Check if an Adv instance exists
+        Parameters
+        ----------
+        adv_id :
+            ID of Adv instance
+
+        Returns
+        -------
+        bool :
+            True if the Adv exists, False otherwise
+        """
+        query = select(exists().where(Adv.id == adv_id))
+        result = await self.session.execute(query)
+        return result.scalar()
+
     async def update(self,
                      adv_data: AdvUpdate,
-                     adv_instance: Adv) -> Adv:
-        """Update an Adv instance
+                     adv_id: int,
+                     author_id: int | None = None) -> Adv | None:
+        """Update an Adv instance with a single UPDATE ... RETURNING statement
         Parameters
         ----------
         adv_data :
             Data of pydantic class AdvCreate to update the Adv
-        adv_instance :
-            An instance of Adv to change
+        adv_id :
+            ID of the Adv instance to change
+        author_id :
+            Change the Adv only if it belongs to the author, any Adv if None
 
         Returns
         -------
         Adv :
-            A changed instance of the Adv class
+            A changed instance of the Adv class, None if it doesn't exist
+            or belongs to another author
         """
-        if not adv_data.model_dump(exclude_unset=True):
-            return adv_instance
+        conditions = [Adv.id == adv_id]
+        if author_id is not None:
+            conditions.append(Adv.author_id == author_id)
+        values = adv_data.model_dump(exclude_unset=True)
+        if not values:
+            result = await self.session.execute(select(Adv).where(*conditions))
+            return result.scalar()
         query = update(Adv).\
-            where(Adv.id == adv_instance.id). \
-            values(**adv_data.model_dump(exclude_unset=True))
-        await self.session.execute(query)
-        await self.session.refresh(adv_instance)
-        await self.session.commit()
+            where(*conditions).\
+            values(**values, version=Adv.version + 1, updated_at=func.now()).\
+            returning(Adv)
+        result = await self.session.execute(query)
+        adv_instance = result.scalar()
+        await self._commit_changes([adv_id] if adv_instance else [])
         return adv_instance
 
-    async def delete(self, adv_id: int) -> Adv:
-        """Delete an Adv instance
+    async def delete(self, adv_id: int, author_id: int | None = None) -> Adv | None:
+        """Delete an Adv instance with a single DELETE ... RETURNING statement
         Parameters
         ----------
         adv_id :
             ID of the Adv instance
+        author_id :
+            Delete the Adv only if it belongs to the author, any Adv if None
 
         Returns
         -------
         Adv :
-            Deleted instance of the Adv class
+            Deleted instance of the Adv class, None if it doesn't exist
+            or belongs to another author
         """
         query = delete(Adv).where(Adv.id == adv_id).returning(Adv)
-        adv_instance = await self.session.execute(query)
+        if author_id is not None:
+            query = query.where(Adv.author_id == author_id)
+        result = await self.session.execute(query)
+        adv_instance = result.scalar()
+        await self._commit_changes([adv_id] if adv_instance else [])
+        return adv_instance
+
+    async def read_ids_by_author(self,
+                                 author_id: int,
+                                 limit: int,
+                                 after_id: int | None = None) -> Sequence[int]:
+        """Return IDs of Adv instances of the author ordered by ID
+        Parameters
+        ----------
+        author_id :
+            ID of author of the Advs
+        limit :
+            Max number of IDs to return
+        after_id :
+            Return only IDs greater than this one, all of them if None
+
+        Returns
+        -------
+        list :
+            IDs of Adv instances
+        """
+        query = select(Adv.id).\
+            where(Adv.author_id == author_id).\
+            order_by(Adv.id).\
+            limit(limit)
+        if after_id is not None:
+            query = query.where(Adv.id > after_id)
+        result = await self.session.execute(query)
+        return result.scalars().all()
+
+    async def delete_by_ids(self, adv_ids: Sequence[int]) -> int:
+        """Delete Adv instances in a separate transaction
+        Parameters
+        ----------
+        adv_ids :
+            IDs of Adv instances
+
+        Returns
+        -------
+        int :
+            Number of deleted instances of the Adv class
+        """
+        query = delete(Adv).\
+            where(Adv.id.in_(adv_ids)).\
+            execution_options(synchronize_session=False)
+        result = await self.session.execute(query)
+        await self._commit_changes(adv_ids)
+        return result.rowcount
+
+    async def _commit_changes(self, adv_ids: Sequence[int]) -> None:
+        """Commit changes of the Advs and drop cached responses with them
+        in all workers"""
+        await publish_invalidation(self.session, adv_ids)
         await self.session.commit()
-        return adv_instance.scalar()
+        adv_cache.invalidate(adv_ids)
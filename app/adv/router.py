@@ -1,37 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
 from sqlalchemy.exc import IntegrityError
 from starlette import status
-from app import User
+from app.adv.cache import CachedResponse, adv_cache
+from app.adv.models import Group
 from app.adv.repository import AdvRepository
-from app.adv.schemas import AdvBase, AdvCreate, AdvUpdate
-from app.adv.service import get_adv_repo
+from app.adv.schemas import AdvBase, AdvCreate, AdvUpdate, adv_serializer
+from app.adv.service import get_adv_repo, get_adv_read_repo, export_advs
 from app.auth.service import check_user_auth
 from app.comments.router import comment_router
-from app.users.permissions import check_owner_or_admin
+from app.etag import make_etag, not_modified
+from app.monitoring.timing import TimedRoute
+from app.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, Page, build_page, decode_cursor
+from app.users.models import Roles
+from app.users.permissions import owner_filter, PermissionChecker
+from app.users.schemas import UserPrincipal
 
-adv_router = APIRouter(prefix="/adv")
+adv_router = APIRouter(prefix="/adv", route_class=TimedRoute)
 adv_router.include_router(comment_router)
 
 
+async def raise_adv_write_error(adv_id: int, repo: AdvRepository):
+    """Raise an error of UPDATE or DELETE which hasn't affected the
+    advertisement: it doesn't exist or user doesn't have access to it"""
+    if not await repo.exists(adv_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Advertisement is not found")
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                        detail="You don't have access")
+
+
 @adv_router.get('/',
                 summary="Get all advertisements",
-                response_model=list[AdvBase])
-async def get_advs(repo: AdvRepository = Depends(get_adv_repo)):
-    """Router for getting all advertisements"""
-    return await repo.read_all()
+                response_model=Page[AdvBase])
+async def get_advs(cursor: str | None = None,
+                   limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                   group: Group | None = None,
+                   author_id: int | None = None,
+                   is_active: bool = True,
+                   repo: AdvRepository = Depends(get_adv_read_repo)):
+    """Router for getting all advertisements page by page. Pass 'next'
+    cursor of a page to get the following one. The list can be filtered
+    by group, author and status, by default only active ones are returned.
+    First pages are cached"""
+    if cursor:
+        advs = await repo.read_records(limit + 1, decode_cursor(cursor)[0], group, author_id, is_active)
+        return adv_serializer.page_response(build_page(advs, limit, lambda adv: (adv.id,)))
+    key = adv_cache.page_key(limit, group, author_id, is_active)
+    cached = adv_cache.get(key)
+    if cached:
+        return cached.response()
+    started = time.monotonic()
+    advs = await repo.read_records(limit + 1, None, group, author_id, is_active)
+    response = adv_serializer.page_response(build_page(advs, limit, lambda adv: (adv.id,)))
+    # The page changes only with Advs up to the one read after it
+    bound = advs[limit].id if len(advs) > limit else None
+    adv_cache.set_page(key, CachedResponse(response.body), bound, started)
+    return response
+
+
+@adv_router.get('/search',
+                summary="Search advertisements by words of title and body",
+                response_model=Page[AdvBase])
+async def search_advs(q: str = Query(min_length=1, max_length=200),
+                      cursor: str | None = None,
+                      limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                      repo: AdvRepository = Depends(get_adv_read_repo)):
+    """Router for full-text search over active advertisements. Results
+    are ordered by relevance, pass 'next' cursor of a page to get the following one"""
+    after = tuple(decode_cursor(cursor, types=(float, int))) if cursor else None
+    advs = await repo.search(q, limit + 1, after)
+    return build_page(advs, limit, lambda adv: (adv.rank, adv.id))
+
+
+@adv_router.get('/export',
+                summary="Export all advertisements as NDJSON - only for ADMIN",
+                dependencies=[Depends(PermissionChecker([Roles.ADMIN_ROLE]))],
+                response_class=StreamingResponse)
+async def export_all_advs(comments: bool = False):
+    """Router for streaming all advertisements, one JSON object per line.
+    Comments of every advertisement are inlined if 'comments' is True.
+    Accessible only for ADMIN"""
+    return StreamingResponse(export_advs(comments), media_type="application/x-ndjson")
 
 
 @adv_router.get('/{adv_id}',
                 summary="Get {adv_id} advertisement",
                 response_model=AdvBase)
 async def get_advs(adv_id: int,
-                   repo: AdvRepository = Depends(get_adv_repo)):
-    """Router for getting all advertisements"""
+                   request: Request,
+                   repo: AdvRepository = Depends(get_adv_read_repo)):
+    """Router for getting an advertisement. Responds with 304 status if
+    If-None-Match header has its current ETag, reading only its version.
+    Responses are cached"""
+    cached = adv_cache.get(adv_cache.adv_key(adv_id))
+    if cached:
+        return not_modified(request, cached.etag) or cached.response()
+    if "if-none-match" in request.headers:
+        version = await repo.read_version(adv_id)
+        if version is not None:
+            not_modified_response = not_modified(request, make_etag("adv", adv_id, version))
+            if not_modified_response:
+                return not_modified_response
+    started = time.monotonic()
     adv = await repo.read(adv_id)
     if not adv:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Advertisement is not found")
-    return adv
+    cached = CachedResponse(to_json(adv_serializer.to_dict(adv)), make_etag("adv", adv.id, adv.version))
+    adv_cache.set_adv(adv_id, cached, started)
+    return cached.response()
 
 
 @adv_router.post('/',
@@ -40,11 +120,11 @@ async def get_advs(adv_id: int,
                  response_model=AdvBase)
 async def create_adv(adv_data: AdvCreate,
                      repo: AdvRepository = Depends(get_adv_repo),
-                     current_user: User = Depends(check_user_auth)):
+                     current_user: UserPrincipal = Depends(check_user_auth)):
     """Router for creating a new advertisement"""
     new_adv = repo.create(adv_data, current_user.id)
     try:
-        await repo.session.commit()
+        await repo.save(new_adv)
         return new_adv
     except IntegrityError as e:
         print(e)
@@ -57,28 +137,23 @@ async def create_adv(adv_data: AdvCreate,
 async def update_adv(adv_id: int,
                      adv_data: AdvUpdate,
                      repo: AdvRepository = Depends(get_adv_repo),
-                     current_user: User = Depends(check_user_auth)):
+                     current_user: UserPrincipal = Depends(check_user_auth)):
     """Router for updating info about an advertisement. Accessible only for
     AUTHOR of an advertisement and for ADMIN"""
-    adv = await repo.read(adv_id)
+    adv = await repo.update(adv_data, adv_id, owner_filter(current_user))
     if not adv:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Advertisement is not found")
-    check_owner_or_admin(adv, current_user)
-    return await repo.update(adv_data, adv)
+        await raise_adv_write_error(adv_id, repo)
+    return adv
 
 
 @adv_router.delete('/{adv_id}',
                    summary="Delete {adv_id} advertisement")
 async def delete_adv(adv_id: int,
                      repo: AdvRepository = Depends(get_adv_repo),
-                     current_user: User = Depends(check_user_auth)):
+                     current_user: UserPrincipal = Depends(check_user_auth)):
     """Router for deleting an advertisement. Accessible only for
      AUTHOR of the advertisement and for ADMIN"""
-    adv = await repo.read(adv_id)
+    adv = await repo.delete(adv_id, owner_filter(current_user))
     if not adv:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Advertisement is not found")
-    check_owner_or_admin(adv, current_user)
-    await repo.delete(adv.id)
+        await raise_adv_write_error(adv_id, repo)
     return f"Advertisement '{adv.title}' has been deleted successfully"
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
 from app.adv.models import Group
+from app.comments.schemas import CommentBase
+from app.serialization import Serializer
 
 
 class AdvCreate(BaseModel):
@@ -18,6 +20,16 @@ class AdvBase(BaseModel):
     group: Group
 
 
+# Serializer of Adv instances loaded from database for list responses
+adv_serializer = Serializer(AdvBase)
+
+
 class AdvUpdate(AdvCreate):
     """Base model to update advertisement info"""
     title: str = Field(min_length=3, max_length=50, default=None)
+
+
+class AdvExport(AdvBase):
+    """Model to export advertisement info with its comments"""
+    is_active: bool
+    comments: list[CommentBase] | None = Field(default=None)
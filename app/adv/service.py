@@ -1,9 +1,59 @@
+from typing import AsyncIterator
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.adv.repository import AdvRepository
-from app.database import get_session
+from app.adv.schemas import AdvExport
+from app.comments.repository import CommentRepository
+from app.database import get_session, get_read_session, async_session_maker
+
+# Number of rows fetched from database cursors and sent to client at once
+EXPORT_BATCH_SIZE = 1000
 
 
 async def get_adv_repo(session: AsyncSession = Depends(get_session)) -> AdvRepository:
     """Service function to return class with Adv CRUD operations"""
     return AdvRepository(session)
+
+
+async def get_adv_read_repo(session: AsyncSession = Depends(get_read_session)) -> AdvRepository:
+    """Service function to return class with Adv read operations on a replica"""
+    return AdvRepository(session)
+
+
+async def export_advs(with_comments: bool = False) -> AsyncIterator[str]:
+    """Service function to generate NDJSON lines with all advertisements.
+    Uses own session since the response is streamed after request
+    dependencies are closed
+    Parameters
+    ----------
+    with_comments :
+        Inline comments of every advertisement if True
+
+    Returns
+    -------
+    str :
+        Chunks of NDJSON lines, one advertisement per line
+    """
+    async with async_session_maker() as session:
+        advs = AdvRepository(session).stream_all(EXPORT_BATCH_SIZE)
+        if with_comments:
+            # Both streams are ordered by Adv ID, so comments are merged
+            # into advertisements without holding more than one row of them
+            comments = CommentRepository(session).stream_all(EXPORT_BATCH_SIZE)
+            comment = await anext(comments, None)
+        lines = []
+        async for adv in advs:
+            adv_comments = None
+            if with_comments:
+                adv_comments = []
+                while comment is not None and comment.adv_id <= adv.id:
+                    if comment.adv_id == adv.id:
+                        adv_comments.append(comment._mapping)
+                    comment = await anext(comments, None)
+            export = AdvExport.model_validate({**adv._mapping, "comments": adv_comments})
+            lines.append(export.model_dump_json(exclude=None if with_comments else {"comments"}) + "\n")
+            if len(lines) >= EXPORT_BATCH_SIZE:
+                yield "".join(lines)
+                lines.clear()
+        if lines:
+            yield "".join(lines)
@@ -1,15 +1,18 @@
+import time
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.exc import IntegrityError
 from starlette import status
 from app.auth.schemas import Token
-from app.auth.service import generate_access_token, auth_user
+from app.auth.service import generate_tokens, auth_user, refresh_user_auth
+from app.monitoring.timing import TimedRoute
+from app.users.cache import principal_cache
 from app.users.repository import UserRepository
-from app.users.schemas import UserCreate
+from app.users.schemas import UserCreate, UserPrincipal
 from app.users.service import get_user_repo
 
-auth_router = APIRouter(prefix="/auth")
+auth_router = APIRouter(prefix="/auth", route_class=TimedRoute)
 
 
 @auth_router.post('/register',
@@ -22,7 +25,9 @@ async def register_user(user_data: UserCreate,
     if user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail={"error": "Choose another username"})
-    user = repo.create(user_data)
+    # Return the connection to pool before a long password hashing
+    await repo.session.close()
+    user = await repo.create(user_data)
     try:
         await repo.session.commit()
         return f"{user.username}, your sign up is finished successfully"
@@ -36,6 +41,7 @@ async def register_user(user_data: UserCreate,
                   response_model=Token)
 async def login_user(user_data: Annotated[OAuth2PasswordRequestForm, Depends()],
                      repo: UserRepository = Depends(get_user_repo)):
+    started = time.monotonic()
     user = await auth_user(UserCreate(
         username=user_data.username,
         password=user_data.password),
@@ -47,5 +53,14 @@ async def login_user(user_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Your account is temporarily blocked")
-    access_token = generate_access_token(user.username)
-    return Token(access_token=access_token)
+    principal = UserPrincipal.model_validate(user)
+    principal_cache.set_read(principal.username, principal, started)
+    return generate_tokens(principal)
+
+
+@auth_router.post('/refresh',
+                  summary="Refresh tokens endpoint",
+                  response_model=Token)
+async def refresh_tokens(user: UserPrincipal = Depends(refresh_user_auth)):
+    """Router for getting a new pair of tokens by a refresh token"""
+    return generate_tokens(user)
@@ -1,7 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class Token(BaseModel):
     """Model to return token info after authorization"""
     access_token: str
+    refresh_token: str | None = Field(default=None)
     type: str = "Bearer"
+
+
+class TokenRefresh(BaseModel):
+    """Model to get a new pair of tokens"""
+    refresh_token: str
+
+
+class TokenPayload(BaseModel):
+    """Model of claims signed into access and refresh tokens, they identify
+    the User and its token version only"""
+    sub: str
+    uid: int
+    ver: int
+    type: str
@@ -2,27 +2,39 @@ from datetime import timedelta, datetime, timezone
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 import jwt
+from pydantic import ValidationError
 from starlette import status
+from app.auth.schemas import Token, TokenPayload, TokenRefresh
 from app.config import settings
+from app.users.cache import principal_cache
 from app.users.models import User
-from app.users.repository import UserRepository, pwd_context
-from app.users.schemas import UserCreate
+from app.users.passwords import verify_password
+from app.users.repository import UserRepository
+from app.users.schemas import UserCreate, UserPrincipal
 from app.users.service import get_user_repo
 
 # Instance of security class to work with tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 # Algorythm that used for encode/decode tokens
 ALGORYTHM = "HS256"
+# Types of tokens to tell access tokens from refresh ones
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
 
 
-def generate_access_token(username: str, token_expires_delta: int | None = 600) -> str:
-    """Service function to generate access token
+def generate_token(user: UserPrincipal, token_type: str, token_expires_delta: int) -> str:
+    """Service function to generate a token with signed User claims.
+    Role and status are not signed, they are read from the cache or DB
+    on every request
     Parameters
     ----------
-    username :
-        Username that encodes with 'sub' key
+    user :
+        Data of the User to encode: username with 'sub' key, ID
+        and token version
+    token_type :
+        Type of the token, ACCESS_TOKEN or REFRESH_TOKEN
     token_expires_delta :
-        Token lifetime, default is 30 minutes
+        Token lifetime in minutes
 
     Returns
     -------
@@ -31,7 +43,10 @@ def generate_access_token(username: str, token_expires_delta: int | None = 600)
     """
     expires_time = datetime.now(timezone.utc) + timedelta(minutes=token_expires_delta)
     data_to_encode = {
-        "sub": username,
+        "sub": user.username,
+        "uid": user.id,
+        "ver": user.token_version,
+        "type": token_type,
         "exp": expires_time
     }
     token = jwt.encode(
@@ -42,53 +57,130 @@ def generate_access_token(username: str, token_expires_delta: int | None = 600)
     return token
 
 
-async def check_token(token: str = Depends(oauth2_scheme)) -> str:
-    """Check if the token is correct and contains a username string
+def generate_tokens(user: UserPrincipal) -> Token:
+    """Service function to generate a pair of short-lived access token
+    and long-lived refresh token
+    Parameters
+    ----------
+    user :
+        Data of the User to encode
+
+    Returns
+    -------
+    Token :
+        Generated access and refresh tokens
+    """
+    return Token(
+        access_token=generate_token(user, ACCESS_TOKEN, settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        refresh_token=generate_token(user, REFRESH_TOKEN, settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+    )
+
+
+def decode_token(token: str, token_type: str) -> TokenPayload:
+    """Check if the token is correct and return its claims
     Parameters
     ----------
     token :
         A generated token
+    token_type :
+        Expected type of the token, ACCESS_TOKEN or REFRESH_TOKEN
 
     Returns
     -------
-    str :
-        A decoded username from token's 'sub' key
+    TokenPayload :
+        Decoded claims of the token
     """
     try:
         payload = jwt.decode(jwt=token, key=settings.SECRET_JWT_KEY, algorithms=[ALGORYTHM])
-        username = payload.get("sub")
-    except jwt.exceptions.DecodeError:
+        claims = TokenPayload.model_validate(payload)
+    except (jwt.exceptions.DecodeError, ValidationError):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Token is wrong. "
                                    "Please, enter correct token or get a new token at /auth/login")
     except jwt.exceptions.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Token is expired. Please, get new a token at /auth/login")
-    if not username:
+    if claims.type != token_type:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Username or password not valid")
-    return username
+                            detail="Token is wrong. "
+                                   "Please, enter correct token or get a new token at /auth/login")
+    return claims
+
+
+def is_issued_to(user: UserPrincipal | None, claims: TokenPayload) -> bool:
+    """Check if the token with the claims is issued to the current version
+    of the User. Usernames are reused after deletion, so the ID is checked too"""
+    return user is not None and user.id == claims.uid and user.token_version == claims.ver
+
+
+async def check_token(token: str = Depends(oauth2_scheme)) -> TokenPayload:
+    """Check if the access token is correct and contains User claims
+    Parameters
+    ----------
+    token :
+        A generated access token
+
+    Returns
+    -------
+    TokenPayload :
+        Decoded claims of the token
+    """
+    return decode_token(token, ACCESS_TOKEN)
 
 
 async def check_user_auth(repo: UserRepository = Depends(get_user_repo),
-                          username: str = Depends(check_token)) -> User:
-    """Check if user authenticated
+                          claims: TokenPayload = Depends(check_token)) -> UserPrincipal:
+    """Check if user authenticated and not blocked. The User known to this
+    worker is trusted, DB is requested only if it is unknown or its ID or
+    token version differs from the token claims
     Parameters
     ----------
     repo :
         UserRepository class with User CRUD operations'
-    username :
-        A decoded username from token's 'sub' key
+    claims :
+        Decoded claims of the access token
 
     Returns
     -------
-    User :
-        A User's class instance
+    UserPrincipal :
+        Identity, role and status of the authenticated User
     """
-    user = await repo.read(username)
-    if not user:
+    user = principal_cache.get(claims.sub)
+    if not is_issued_to(user, claims):
+        user = await repo.read_principal(claims.sub)
+        if not is_issued_to(user, claims):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                                detail="Token is revoked. Please, get a new token at /auth/login")
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Your account is temporarily blocked")
+    return user
+
+
+async def refresh_user_auth(token_data: TokenRefresh,
+                            repo: UserRepository = Depends(get_user_repo)) -> UserPrincipal:
+    """Check if the refresh token is correct and not revoked. User data
+    is always requested from DB
+    Parameters
+    ----------
+    token_data :
+        Data of pydantic class TokenRefresh with a refresh token
+    repo :
+        UserRepository class with User CRUD operations'
+
+    Returns
+    -------
+    UserPrincipal :
+        Identity, role and status of the User
+    """
+    claims = decode_token(token_data.refresh_token, REFRESH_TOKEN)
+    user = await repo.read_principal(claims.sub)
+    if not is_issued_to(user, claims):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Token is revoked. Please, get a new token at /auth/login")
+    if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Username or password not valid")
+                            detail="Your account is temporarily blocked")
     return user
 
 
@@ -109,6 +201,8 @@ async def auth_user(user_data: UserCreate,
         A User's class instance
     """
     user = await repo.read(user_data.username)
-    if not (user and pwd_context.verify(user_data.password, user.password)):
+    # Return the connection to pool before a long password verification
+    await repo.session.close()
+    if not (user and await verify_password(user_data.password, user.password)):
         return None
     return user
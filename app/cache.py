@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# The listener connection is checked every LISTEN_HEARTBEAT_SECONDS and
+# reconnected after LISTEN_RETRY_SECONDS if it's lost
+LISTEN_HEARTBEAT_SECONDS = 10
+LISTEN_RETRY_SECONDS = 1
+
+
+class TTLCache:
+    """Bounded in-process LRU cache which expires entries after a time-to-live"""
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return a cached value or None if it is missing or expired"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Put a value to the cache evicting the least recently used one if it's full"""
+        if self.max_size <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a value from the cache"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all values from the cache"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SizedLRUCache:
+    """Bounded in-process LRU cache limited by total size of values in
+    bytes, counting hits, misses and evictions"""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[int, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return a cached value or None if it is missing"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, size: int) -> None:
+        """Put a value of 'size' bytes to the cache evicting the least recently
+        used ones till all values fit. Values bigger than the cache are skipped"""
+        if size > self.max_bytes:
+            return
+        self.invalidate(key)
+        self._data[key] = (size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (evicted_size, _) = self._data.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a value from the cache"""
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.size -= item[0]
+
+    def clear(self) -> None:
+        """Remove all values from the cache"""
+        self._data.clear()
+        self.size = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class InvalidationListener:
+    """Connection to the primary listening to Postgres channels of cache
+    invalidations, one per worker process for all caches. A cache must not
+    be used while the connection is lost, since notifications of other
+    workers may be missed meanwhile"""
+    def __init__(self):
+        self.listening = False
+        # Handlers of notifications and of changes of the state by channel
+        self._channels: dict[str, tuple[Callable[[str], None], Callable[[bool], None]]] = {}
+
+    def subscribe(self, channel: str, on_notification: Callable[[str], None],
+                  on_state: Callable[[bool], None]) -> None:
+        """Register handlers of a channel, must be called before listen
+        Parameters
+        ----------
+        channel :
+            Name of the Postgres channel
+        on_notification :
+            Called with the payload of every notification
+        on_state :
+            Called with True when the listening starts, a cache must drop all
+            its values then, and with False when it stops
+        """
+        self._channels[channel] = (on_notification, on_state)
+
+    async def listen(self) -> None:
+        """Keep listening to the subscribed channels till cancelled"""
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(host=settings.DB_HOST, port=settings.DB_PORT,
+                                                   user=settings.DB_USER, password=settings.DB_PASS,
+                                                   database=settings.DB_NAME)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                for channel, (on_notification, _) in self._channels.items():
+                    await connection.add_listener(
+                        channel, lambda _connection, _pid, _channel, payload, handler=on_notification:
+                        handler(payload))
+                self._set_state(True)
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), LISTEN_HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        await connection.fetchval("SELECT 1", timeout=LISTEN_HEARTBEAT_SECONDS)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.warning("Listener of cache invalidations failed: %r", e)
+            finally:
+                self._set_state(False)
+                if connection is not None:
+                    connection.terminate()
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    def _set_state(self, listening: bool) -> None:
+        self.listening = listening
+        for _, on_state in self._channels.values():
+            on_state(listening)
+
+
+# Listener of this worker process, started by the lifespan of the app
+invalidation_listener = InvalidationListener()
+
+
+async def notify(session: AsyncSession, channel: str, payload: str) -> None:
+    """Send a notification to all workers when the transaction of the
+    session is committed. Payloads are limited to 8000 bytes"""
+    await session.execute(select(func.pg_notify(channel, payload)))
@@ -1,4 +1,5 @@
-from sqlalchemy import BigInteger, String, ForeignKey, Integer
+from datetime import datetime
+from sqlalchemy import BigInteger, String, ForeignKey, Integer, Index, DateTime, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 
@@ -10,10 +11,21 @@ class Comment(Base):
     body: Mapped[str] = mapped_column(String(500))
     author_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id", ondelete="CASCADE"))
     adv_id: Mapped[int] = mapped_column(Integer, ForeignKey("advertisement.id", ondelete="CASCADE"))
+    # Incremented and set on every change of the row, version is a part of ETag of the thread
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
-    author: Mapped["User"] = relationship("User", lazy="selectin", back_populates="comments")
-    adv: Mapped["Adv"] = relationship("Adv", lazy="selectin", back_populates="comments")
+    # Relationships are never loaded implicitly, queries set loader options if they need them
+    author: Mapped["User"] = relationship("User", lazy="raise", back_populates="comments")
+    adv: Mapped["Adv"] = relationship("Adv", lazy="raise", back_populates="comments")
+
+    # Composite indexes to serve pages of an Adv's comments and to find
+    # comments of a user by index range scans
+    __table_args__ = (
+        Index("ix_comment_adv_id_id", "adv_id", "id"),
+        Index("ix_comment_author_id_id", "author_id", "id"),
+    )
 
     def __repr__(self) -> str:
         return f"Comment("f"id={self.id}, body={self.body}, " \
-               f"author={self.author.username}, adv={self.adv.id})"
+               f"author_id={self.author_id}, adv_id={self.adv_id})"
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True, frozen=True)
+class CommentRecord:
+    """Read-only row of a comment without ORM state"""
+    id: int
+    body: str
+    author_id: int
+    adv_id: int
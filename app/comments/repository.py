@@ -1,10 +1,14 @@
-from typing import Sequence
-from sqlalchemy import select, update, delete
+from typing import AsyncIterator, Sequence
+from sqlalchemy import Row, Select, select, update, delete, exists, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.adv.models import Group, Adv
 from app.comments.models import Comment
+from app.comments.records import CommentRecord
 from app.comments.schemas import CommentCreate
 
+# Columns of CommentRecord in the order of its fields
+COMMENT_RECORD_COLUMNS = (Comment.id, Comment.body, Comment.author_id, Comment.adv_id)
+
 
 class CommentRepository:
     def __init__(self, session: AsyncSession):
@@ -50,66 +54,263 @@ class CommentRepository:
         result = await self.session.execute(query)
         return result.scalar()
 
-    async def read_all(self, adv_id: int) -> Sequence[Comment]:
-        """Return list of all Comment instances for the Adv
+    async def read_all(self,
+                       adv_id: int,
+                       limit: int | None = None,
+                       after_id: int | None = None) -> Sequence[Comment]:
+        """Return a page of Comment instances for the Adv ordered by ID
+        Parameters
+        ----------
+        adv_id :
+            ID of Adv of the Comments
+        limit :
+            Max number of Comment instances to return, all of them if None
+        after_id :
+            ID of the last Comment on the previous page, first page if None
+
         Returns
         -------
         Comment :
-            All instances of the Comment class from database
+            Instances of the Comment class from database with ID greater than 'after_id'
         """
-        query = select(Comment).where(Comment.adv_id == adv_id)
+        query = self._page_query(select(Comment), adv_id, limit, after_id)
         result = await self.session.execute(query)
         return result.scalars().all()
 
+    async def read_records(self,
+                           adv_id: int,
+                           limit: int | None = None,
+                           after_id: int | None = None) -> list[CommentRecord]:
+        """Return a page of comments of the Adv as read-only records ordered by ID.
+        Only viewed columns are selected and no ORM instances are built
+        Parameters
+        ----------
+        adv_id :
+            ID of Adv of the Comments
+        limit :
+            Max number of records to return, all of them if None
+        after_id :
+            ID of the last Comment on the previous page, first page if None
+
+        Returns
+        -------
+        CommentRecord :
+            Records of comments with ID greater than 'after_id'
+        """
+        query = self._page_query(select(*COMMENT_RECORD_COLUMNS), adv_id, limit, after_id)
+        result = await self.session.execute(query)
+        return [CommentRecord(*row) for row in result]
+
+    @staticmethod
+    def _page_query(query: Select, adv_id: int, limit: int | None, after_id: int | None) -> Select:
+        """Add filters, order and limit of a page of comments to the query"""
+        query = query.\
+            where(Comment.adv_id == adv_id).\
+            order_by(Comment.id).\
+            limit(limit)
+        if after_id is not None:
+            query = query.where(Comment.id > after_id)
+        return query
+
+    async def stream_all(self, batch_size: int) -> AsyncIterator[Row]:
+        """Iterate over all Comment rows ordered by Adv ID using a server-side cursor
+        Parameters
+        ----------
+        batch_size :
+            Number of rows fetched from the cursor at once
+
+        Returns
+        -------
+        Row :
+            Rows with columns of the Comment table
+        """
+        query = select(*Comment.__table__.columns).\
+            order_by(Comment.adv_id, Comment.id).\
+            execution_options(yield_per=batch_size)
+        result = await self.session.stream(query)
+        async for row in result:
+            yield row
+
+    async def read_thread_state(self, adv_id: int) -> tuple[int, int | None, int | None]:
+        """Return an aggregate of all Comments of the Adv which changes on
+        every write to them: a new Comment raises the max ID, a deleted one
+        lowers the number, a changed one raises the sum of versions
+        Parameters
+        ----------
+        adv_id :
+            ID of Adv of the Comments
+
+        Returns
+        -------
+        tuple :
+            Number of the Comments, their max ID and sum of versions
+        """
+        query = select(func.count(), func.max(Comment.id), func.sum(Comment.version)).\
+            where(Comment.adv_id == adv_id)
+        count, max_id, version_sum = (await self.session.execute(query)).one()
+        return count, max_id, version_sum
+
+    async def exists(self, comment_id: int, adv_id: int) -> bool:
+        """Check if a Comment instance of the Adv exists
+        Parameters
+        ----------
+        comment_id :
+            ID of a Comment instance
+        adv_id :
+            ID of Adv of the Comment
+
+        Returns
+        -------
+        bool :
+            True if the Comment exists, False otherwise
+        """
+        query = select(exists().where(Comment.id == comment_id, Comment.adv_id == adv_id))
+        result = await self.session.execute(query)
+        return result.scalar()
+
     async def update(self,
                      comment_data: CommentCreate,
-                     comment_instance: Comment) -> Comment:
-        """Update a Comment instance
+                     comment_id: int,
+                     adv_id: int,
+                     author_id: int | None = None) -> Comment | None:
+        """Update a Comment instance with a single UPDATE ... RETURNING statement
         Parameters
         ----------
         comment_data :
             Data of pydantic class CommentCreate to update the Comment
-        comment_instance :
-            An instance of Comment to change
+        comment_id :
+            ID of the Comment instance to change
+        adv_id :
+            ID of Adv of the Comment
+        author_id :
+            Change the Comment only if it belongs to the author, any Comment if None
 
         Returns
         -------
         Comment :
-            A changed instance of the Comment class
+            A changed instance of the Comment class, None if it doesn't exist
+            or belongs to another author
         """
-        if not comment_data.model_dump(exclude_unset=True):
-            return comment_instance
+        conditions = [Comment.id == comment_id, Comment.adv_id == adv_id]
+        if author_id is not None:
+            conditions.append(Comment.author_id == author_id)
+        values = comment_data.model_dump(exclude_unset=True)
+        if not values:
+            result = await self.session.execute(select(Comment).where(*conditions))
+            return result.scalar()
         query = update(Comment). \
-            where(Comment.id == comment_instance.id). \
-            values(**comment_data.model_dump(exclude_unset=True))
-        await self.session.execute(query)
-        await self.session.refresh(comment_instance)
+            where(*conditions). \
+            values(**values, version=Comment.version + 1, updated_at=func.now()). \
+            returning(Comment)
+        result = await self.session.execute(query)
+        comment_instance = result.scalar()
         await self.session.commit()
         return comment_instance
 
-    async def delete(self, comment_id: int) -> Comment:
-        """Delete a Comment instance
+    async def delete(self,
+                     comment_id: int,
+                     adv_id: int,
+                     author_id: int | None = None) -> Comment | None:
+        """Delete a Comment instance with a single DELETE ... RETURNING statement
         Parameters
         ----------
         comment_id :
             ID of the Comment instance
+        adv_id :
+            ID of Adv of the Comment
+        author_id :
+            Delete the Comment only if its Adv belongs to the author,
+            any Comment if None
 
         Returns
         -------
         Comment :
-            Deleted instance of the Comment class
+            Deleted instance of the Comment class, None if it doesn't exist
+            or its Adv belongs to another author
         """
-        query = delete(Comment).where(Comment.id == comment_id).returning(Comment)
-        comment_instance = await self.session.execute(query)
+        query = delete(Comment). \
+            where(Comment.id == comment_id, Comment.adv_id == adv_id). \
+            returning(Comment)
+        if author_id is not None:
+            adv_of_author = exists().where(Adv.id == adv_id, Adv.author_id == author_id)
+            query = query.where(adv_of_author)
+        result = await self.session.execute(query)
+        comment_instance = result.scalar()
         await self.session.commit()
-        return comment_instance.scalar()
+        return comment_instance
 
-    async def delete_group(self, adv_group: Group) -> int:
-        """Delete all Comment instances from specific Adv Group
+    async def delete_by_author(self, author_id: int, limit: int) -> int:
+        """Delete a batch of Comment instances of the author in a separate transaction
+        Parameters
+        ----------
+        author_id :
+            ID of author of the Comments
+        limit :
+            Max number of Comment instances to delete
+
+        Returns
+        -------
+        int :
+            Number of deleted instances of the Comment class, less than
+            'limit' if there are no more comments of the author
+        """
+        subquery = select(Comment.id).\
+            where(Comment.author_id == author_id).\
+            limit(limit)
+        return await self._delete_batch(subquery)
+
+    async def delete_by_advs(self, adv_ids: Sequence[int], limit: int) -> int:
+        """Delete a batch of Comment instances of the Advs in a separate transaction
+        Parameters
+        ----------
+        adv_ids :
+            IDs of Advs of the Comments
+        limit :
+            Max number of Comment instances to delete
+
+        Returns
+        -------
+        int :
+            Number of deleted instances of the Comment class, less than
+            'limit' if there are no more comments of the Advs
+        """
+        subquery = select(Comment.id).\
+            where(Comment.adv_id.in_(adv_ids)).\
+            limit(limit)
+        return await self._delete_batch(subquery)
+
+    async def _delete_batch(self, subquery: Select) -> int:
+        """Delete Comment instances with IDs selected by the subquery and commit"""
+        query = delete(Comment).\
+            where(Comment.id.in_(subquery)).\
+            execution_options(synchronize_session=False)
+        result = await self.session.execute(query)
+        await self.session.commit()
+        return result.rowcount
+
+    async def id_range(self) -> tuple[int, int] | None:
+        """Return the lowest and the highest ID of Comment instances
+        Returns
+        -------
+        tuple :
+            Min and max ID, or None if there are no comments
+        """
+        query = select(func.min(Comment.id), func.max(Comment.id))
+        min_id, max_id = (await self.session.execute(query)).one()
+        if min_id is None:
+            return None
+        return min_id, max_id
+
+    async def delete_group(self, adv_group: Group, start_id: int, end_id: int) -> int:
+        """Delete Comment instances from specific Adv Group within an ID range
         Parameters
         ----------
         adv_group :
             Name of an Adv's Group
+        start_id :
+            Lowest ID of the range
+        end_id :
+            ID following the highest one of the range
 
         Returns
         -------
@@ -118,8 +319,10 @@ class CommentRepository:
         """
         subquery = select(Adv.id).where(Adv.group == adv_group)
         query = delete(Comment). \
-            where(Comment.adv_id.in_(subquery)). \
-            returning(Comment)
-        comment_instances = await self.session.execute(query)
+            where(Comment.id >= start_id,
+                  Comment.id < end_id,
+                  Comment.adv_id.in_(subquery)). \
+            execution_options(synchronize_session=False)
+        result = await self.session.execute(query)
         await self.session.commit()
-        return len(comment_instances.scalars().all())
+        return result.rowcount
@@ -1,19 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
-from app import User
 from app.adv.models import Group
 from app.adv.repository import AdvRepository
 from app.adv.service import get_adv_repo
 from app.auth.service import check_user_auth
 from app.comments.repository import CommentRepository
-from app.comments.schemas import CommentBase, CommentCreate
-from app.database import get_session
+from app.comments.schemas import CommentBase, CommentCreate, comment_serializer
+from app.comments.service import purge_group_comments
+from app.database import get_session, get_read_session
+from app.etag import make_etag, not_modified
+from app.jobs.schemas import Job
+from app.jobs.service import create_job, run_job
+from app.monitoring.timing import TimedRoute
+from app.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, Page, build_page, decode_cursor
 from app.users.models import Roles
-from app.users.permissions import check_owner_or_admin, PermissionChecker
+from app.users.permissions import owner_filter, PermissionChecker
+from app.users.schemas import UserPrincipal
 
-comment_router = APIRouter()
+comment_router = APIRouter(route_class=TimedRoute)
 
 
 async def get_comment_repo(session: AsyncSession = Depends(get_session)) -> CommentRepository:
@@ -21,63 +27,93 @@ async def get_comment_repo(session: AsyncSession = Depends(get_session)) -> Comm
     return CommentRepository(session)
 
 
+async def get_comment_read_repo(session: AsyncSession = Depends(get_read_session)) -> CommentRepository:
+    """Service function to return class with Comment read operations on a replica"""
+    return CommentRepository(session)
+
+
+async def raise_comment_write_error(adv_id: int,
+                                    comment_id: int,
+                                    repo: CommentRepository,
+                                    adv_repo: AdvRepository):
+    """Raise an error of UPDATE or DELETE which hasn't affected the comment:
+    it or its advertisement doesn't exist or user doesn't have access to it"""
+    if not await adv_repo.exists(adv_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Advertisement is not found")
+    if not await repo.exists(comment_id, adv_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Comment is not found")
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                        detail="You don't have access")
+
+
 @comment_router.get('/{adv_id}/comments',
                     summary="Get all comments of {adv_id} advertisement",
-                    response_model=list[CommentBase] | None)
+                    response_model=Page[CommentBase])
 async def get_comments(adv_id: int,
-                       repo: CommentRepository = Depends(get_comment_repo)):
-    """Router for getting all comments of any advertisement"""
-    comments = await repo.read_all(adv_id)
-    return comments
+                       request: Request,
+                       cursor: str | None = None,
+                       limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                       repo: CommentRepository = Depends(get_comment_read_repo)):
+    """Router for getting all comments of any advertisement page by page.
+    Pass 'next' cursor of a page to get the following one. ETag of every
+    page is the state of the whole thread, so responds with 304 status
+    if If-None-Match header has it and no comment has changed since"""
+    after_id = decode_cursor(cursor)[0] if cursor else None
+    # The state is read before the page, so the ETag is never newer than the data
+    etag = make_etag("comments", adv_id, *await repo.read_thread_state(adv_id))
+    not_modified_response = not_modified(request, etag)
+    if not_modified_response:
+        return not_modified_response
+    comments = await repo.read_records(adv_id, limit + 1, after_id)
+    response = comment_serializer.page_response(build_page(comments, limit, lambda comment: (comment.id,)))
+    response.headers["ETag"] = etag
+    return response
 
 
 @comment_router.post('/{adv_id}/comments',
                      summary="Create new comment for {adv_id} advertisement",
                      status_code=status.HTTP_201_CREATED,
-                     response_model=list[CommentBase])
+                     response_model=CommentBase | list[CommentBase])
 async def create_comment(comment_data: CommentCreate,
                          adv_id: int,
+                         full_thread: bool = False,
                          repo: CommentRepository = Depends(get_comment_repo),
-                         adv_repo: AdvRepository = Depends(get_adv_repo),
-                         current_user: User = Depends(check_user_auth)):
-    """Router for creating a new comment"""
-    adv = await adv_repo.read(adv_id)
-    if not adv:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Advertisement is not found")
-    repo.create(comment_data, current_user.id, adv_id)
+                         current_user: UserPrincipal = Depends(check_user_auth)):
+    """Router for creating a new comment. Returns the new comment, or
+    all comments of the advertisement if 'full_thread' is True"""
+    comment = repo.create(comment_data, current_user.id, adv_id)
     try:
         await repo.session.commit()
-        comments = await repo.read_all(adv_id)
-        return comments
-    except IntegrityError as e:
-        print(e)
+    except IntegrityError:
         await repo.session.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Advertisement is not found")
+    if full_thread:
+        return await repo.read_all(adv_id)
+    return comment
 
 
 @comment_router.put('/{adv_id}/comments/{comment_id}',
                     summary="Update comment with {comment_id} of {adv_id} advertisement",
-                    response_model=list[CommentBase])
+                    response_model=CommentBase | list[CommentBase])
 async def update_comments(adv_id: int,
                           comment_id: int,
                           comment_data: CommentCreate,
+                          full_thread: bool = False,
                           repo: CommentRepository = Depends(get_comment_repo),
                           adv_repo: AdvRepository = Depends(get_adv_repo),
-                          current_user: User = Depends(check_user_auth)):
-    """Router for changing a comment. Accessible only for
-    AUTHOR of the comment and for ADMIN"""
-    adv = await adv_repo.read(adv_id)
-    if not adv:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Advertisement is not found")
-    comment = await repo.read(comment_id)
+                          current_user: UserPrincipal = Depends(check_user_auth)):
+    """Router for changing a comment. Accessible only for AUTHOR of
+    the comment and for ADMIN. Returns the changed comment, or all
+    comments of the advertisement if 'full_thread' is True"""
+    comment = await repo.update(comment_data, comment_id, adv_id, owner_filter(current_user))
     if not comment:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Comment is not found")
-    check_owner_or_admin(comment, current_user)
-    await repo.update(comment_data, comment)
-    comments = await repo.read_all(adv_id)
-    return comments
+        await raise_comment_write_error(adv_id, comment_id, repo, adv_repo)
+    if full_thread:
+        return await repo.read_all(adv_id)
+    return comment
 
 
 @comment_router.delete('/{adv_id}/comments/{comment_id}',
@@ -87,30 +123,26 @@ async def delete_comment(adv_id: int,
                          comment_id: int,
                          repo: CommentRepository = Depends(get_comment_repo),
                          adv_repo: AdvRepository = Depends(get_adv_repo),
-                         current_user: User = Depends(check_user_auth)):
+                         current_user: UserPrincipal = Depends(check_user_auth)):
     """Router for deleting a comment. Accessible only for
      AUTHOR of the comment and for ADMIN"""
-    adv = await adv_repo.read(adv_id)
-    if not adv:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Advertisement is not found")
-    comment = await repo.read(comment_id)
+    comment = await repo.delete(comment_id, adv_id, owner_filter(current_user))
     if not comment:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Comment is not found")
-    check_owner_or_admin(adv, current_user)
-    await repo.delete(comment_id)
+        await raise_comment_write_error(adv_id, comment_id, repo, adv_repo)
     return f"Comment '{comment.body}' has been deleted successfully"
 
 
 @comment_router.delete('/del_comments/{adv_group}',
                        summary="Delete all comments of {adv_group} advertisements - only for ADMIN",
-                       dependencies=[Depends(PermissionChecker([Roles.ADMIN_ROLE]))])
+                       dependencies=[Depends(PermissionChecker([Roles.ADMIN_ROLE]))],
+                       status_code=status.HTTP_202_ACCEPTED,
+                       response_model=Job)
 async def delete_comments(adv_group: Group,
-                         repo: CommentRepository = Depends(get_comment_repo)):
+                          background_tasks: BackgroundTasks):
     """Router for deleting all comments from specific Adv Group.
-    Accessible only for ADMIN"""
-    res = await repo.delete_group(adv_group)
-    if not res:
-        return f"No comments to delete from '{adv_group}' group advertisements"
-    return f"{res} comment(-s) deleted from '{adv_group}' group advertisements"
+    Comments are deleted by a background job, its state is available
+    at /jobs/{job_id}. Accessible only for ADMIN"""
+    job = await create_job(f"Delete comments of '{adv_group.value}' group advertisements",
+                           purge_group_comments, adv_group.value)
+    background_tasks.add_task(run_job, job, purge_group_comments, adv_group.value)
+    return job
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from app.serialization import Serializer
 
 
 class CommentCreate(BaseModel):
@@ -11,3 +12,7 @@ class CommentBase(CommentCreate):
     id: int
     author_id: int
     adv_id: int
+
+
+# Serializer of Comment instances loaded from database for list responses
+comment_serializer = Serializer(CommentBase)
@@ -0,0 +1,32 @@
+from app.adv.models import Group
+from app.comments.repository import CommentRepository
+from app.config import settings
+from app.database import async_session_maker
+from app.jobs.schemas import Job
+from app.jobs.service import job_function
+
+
+@job_function
+async def purge_group_comments(job: Job, adv_group: str) -> None:
+    """Service function to delete all comments of advertisements from
+    specific Group. Comments are deleted in ID ranges of DELETE_BATCH_SIZE,
+    every range in its own transaction. Uses own session since it runs
+    as a background job after the request is closed
+    Parameters
+    ----------
+    job :
+        State of the job to report progress
+    adv_group :
+        Value of an Adv's Group
+    """
+    adv_group = Group(adv_group)
+    async with async_session_maker() as session:
+        repo = CommentRepository(session)
+        id_range = await repo.id_range()
+        if id_range is None:
+            return
+        min_id, max_id = id_range
+        for start_id in range(min_id, max_id + 1, settings.DELETE_BATCH_SIZE):
+            end_id = start_id + settings.DELETE_BATCH_SIZE
+            job.processed += await repo.delete_group(adv_group, start_id, end_id)
+            job.progress = min(1.0, (end_id - min_id) / (max_id - min_id + 1))
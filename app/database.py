@@ -1,18 +1,44 @@
+import hashlib
+import hmac
+import itertools
+import time
+from fastapi import Request
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker
 )
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import settings
+from app.monitoring.pool import InstrumentedPool
+from app.monitoring.queries import instrument_engine
 
-engine = create_async_engine(settings.async_database_url)
+engine = create_async_engine(settings.async_database_url,
+                             poolclass=InstrumentedPool,
+                             **settings.engine_options)
 async_session_maker = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
+# Engines of read replicas, read sessions use them in turn
+replica_engines = [create_async_engine(url, poolclass=InstrumentedPool, **settings.engine_options)
+                   for url in settings.DB_REPLICA_URLS]
+_replica_cycle = itertools.cycle(replica_engines)
+if settings.METRICS_ENABLED or settings.SERVER_TIMING_ENABLED or settings.SLOW_QUERY_MS:
+    for instrumented_engine in (engine, *replica_engines):
+        instrument_engine(instrumented_engine)
+# Methods of requests which don't change data
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# A client which has changed data gets a signed marker with the WAL position
+# of the primary after the change, in the cookie and in the header. The
+# marker is sent back by the client, so every worker routes its reads to
+# a replica only if the replica has replayed the change
+WRITE_MARKER_COOKIE = "last_write"
+WRITE_MARKER_HEADER = "X-Last-Write"
 
 
 class Base(DeclarativeBase):
@@ -20,7 +46,91 @@ class Base(DeclarativeBase):
     pass
 
 
+def make_write_marker(lsn: str) -> str:
+    """Return a signed marker of a write valid for READ_YOUR_WRITES_SECONDS
+    Parameters
+    ----------
+    lsn :
+        WAL position of the primary after the write, e.g. '0/1A2B3C4'
+
+    Returns
+    -------
+    str :
+        Marker in 'lsn.expires.signature' format
+    """
+    value = f"{lsn}.{int(time.time()) + settings.READ_YOUR_WRITES_SECONDS}"
+    return f"{value}.{_sign(value)}"
+
+
+def read_write_marker(marker: str | None) -> str | None:
+    """Return the WAL position of a marker made by make_write_marker,
+    None if it is missing, forged or expired"""
+    if not marker:
+        return None
+    value, _, signature = marker.rpartition(".")
+    lsn, _, expires = value.partition(".")
+    if not hmac.compare_digest(signature, _sign(value)) or not expires.isdigit():
+        return None
+    return lsn if int(expires) >= time.time() else None
+
+
+def _sign(value: str) -> str:
+    return hmac.new(settings.SECRET_JWT_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+class WriteMarkerMiddleware:
+    """ASGI middleware which adds a write marker to successful responses
+    of requests changing data. Used only with read replicas, it reads the
+    current WAL position of the primary after the endpoint has committed"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                async with engine.connect() as connection:
+                    lsn = (await connection.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar()
+                marker = make_write_marker(lsn)
+                cookie = f"{WRITE_MARKER_COOKIE}={marker}; Max-Age={settings.READ_YOUR_WRITES_SECONDS}; " \
+                         f"Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = [*message.get("headers", []),
+                                      (b"set-cookie", cookie.encode()),
+                                      (WRITE_MARKER_HEADER.lower().encode(), marker.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
 async def get_session() -> AsyncSession:
-    """Async session generator"""
+    """Async session generator. Sessions are bound to the primary"""
     async with async_session_maker() as session:
         yield session
+
+
+async def _has_replayed(replica: AsyncEngine, lsn: str) -> bool:
+    """Check if the replica has replayed WAL up to the position. A database
+    which isn't in recovery is the primary itself, so it has everything"""
+    async with replica.connect() as connection:
+        result = await connection.execute(
+            text("SELECT coalesce(pg_last_wal_replay_lsn() >= CAST(CAST(:lsn AS text) AS pg_lsn), true)"), {"lsn": lsn})
+        return result.scalar()
+
+
+async def get_read_session(request: Request) -> AsyncSession:
+    """Async session generator for read-only requests. Sessions are bound
+    to a replica if there are any, unless the client has sent a write
+    marker which the replica hasn't replayed yet. Such clients read from
+    the primary, so they see their own changes"""
+    bind = engine
+    if replica_engines:
+        replica = next(_replica_cycle)
+        lsn = read_write_marker(request.cookies.get(WRITE_MARKER_COOKIE)
+                                or request.headers.get(WRITE_MARKER_HEADER))
+        if lsn is None or await _has_replayed(replica, lsn):
+            bind = replica
+    async with async_session_maker(bind=bind) as session:
+        yield session
@@ -0,0 +1,46 @@
+import hashlib
+import json
+from typing import Any
+from fastapi import Request, Response
+from starlette import status
+
+
+def make_etag(*parts: Any) -> str:
+    """Return a strong ETag of a resource state
+    Parameters
+    ----------
+    parts :
+        JSON-compatible values which change on every change of the
+        representation (e.g. kind, ID and version of a row)
+
+    Returns
+    -------
+    str :
+        Quoted opaque entity tag
+    """
+    raw = json.dumps(parts, separators=(",", ":")).encode()
+    return f'"{hashlib.blake2b(raw, digest_size=16).hexdigest()}"'
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """Return 304 response if If-None-Match header of the request matches
+    the ETag. Tags are compared weakly as RFC 9110 requires for this header
+    Parameters
+    ----------
+    request :
+        Conditional GET request
+    etag :
+        Current ETag of the resource
+
+    Returns
+    -------
+    Response :
+        Empty 304 response with the ETag, None if the client has another version
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    if "*" not in tags and etag not in tags:
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
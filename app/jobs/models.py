@@ -0,0 +1,33 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Enum, Float, String, Text, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+from app.jobs.schemas import JobStatus
+
+
+class BackgroundJob(Base):
+    """Background job database model, shared by all worker processes"""
+    __tablename__ = "job"
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    name: Mapped[str] = mapped_column(String(250))
+    # Registered job function and its JSON arguments to run it again
+    # if the worker running it has stopped
+    function: Mapped[str] = mapped_column(String(100))
+    arguments: Mapped[list] = mapped_column(JSONB, default=list, server_default="[]")
+    status: Mapped[JobStatus] = mapped_column(Enum(JobStatus, name="job_status"), default=JobStatus.PENDING)
+    processed: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    progress: Mapped[float] = mapped_column(Float, default=0.0, server_default="0")
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Heartbeat of the worker running the job, set on every save of its state
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # Unfinished jobs are searched by their heartbeat
+    __table_args__ = (
+        Index("ix_job_status_updated_at", "status", "updated_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"BackgroundJob(id={self.id}, name={self.name}, status={self.status})"
@@ -0,0 +1,111 @@
+from typing import Sequence
+from datetime import timedelta
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.jobs.models import BackgroundJob
+from app.jobs.schemas import Job, JobStatus
+
+# States of jobs which have not finished yet
+UNFINISHED_STATUSES = (JobStatus.PENDING, JobStatus.RUNNING)
+
+
+class JobRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, job: Job, function: str, arguments: list) -> BackgroundJob:
+        """Save a new Job
+        Parameters
+        ----------
+        job :
+            State of the new Job
+        function :
+            Name of the registered job function
+        arguments :
+            JSON-compatible arguments of the function
+
+        Returns
+        -------
+        BackgroundJob :
+            A new instance of the BackgroundJob class
+        """
+        new_job = BackgroundJob(function=function, arguments=arguments,
+                                **job.model_dump(exclude={"finished_at", "error"}))
+        self.session.add(new_job)
+        await self.session.commit()
+        return new_job
+
+    async def read(self, job_id: str) -> BackgroundJob | None:
+        """Return a Job by its ID from DB
+        Parameters
+        ----------
+        job_id :
+            ID of a Job
+
+        Returns
+        -------
+        BackgroundJob :
+            An instance of the BackgroundJob class, None if it doesn't exist
+        """
+        query = select(BackgroundJob).where(BackgroundJob.id == job_id)
+        result = await self.session.execute(query)
+        return result.scalar()
+
+    async def save(self, job: Job) -> None:
+        """Save state and progress of a Job and mark it as alive
+        Parameters
+        ----------
+        job :
+            Current state of the Job
+        """
+        query = update(BackgroundJob). \
+            where(BackgroundJob.id == job.id). \
+            values(**job.model_dump(include={"status", "processed", "progress", "error", "finished_at"}),
+                   updated_at=func.now())
+        await self.session.execute(query)
+        await self.session.commit()
+
+    async def claim_stale(self, stale_seconds: float, limit: int) -> Sequence[BackgroundJob]:
+        """Take over unfinished Jobs whose state has not been saved for
+        'stale_seconds', since their workers have stopped. Rows locked by
+        other workers claiming them at the same moment are skipped
+        Parameters
+        ----------
+        stale_seconds :
+            Time after the last save of a Job to consider it abandoned
+        limit :
+            Max number of Jobs to claim
+
+        Returns
+        -------
+        Sequence[BackgroundJob] :
+            Claimed Jobs, they are marked as alive
+        """
+        stale_ids = select(BackgroundJob.id). \
+            where(BackgroundJob.status.in_(UNFINISHED_STATUSES),
+                  BackgroundJob.updated_at < func.now() - timedelta(seconds=stale_seconds)). \
+            order_by(BackgroundJob.created_at). \
+            limit(limit). \
+            with_for_update(skip_locked=True)
+        query = update(BackgroundJob). \
+            where(BackgroundJob.id.in_(stale_ids.scalar_subquery())). \
+            values(updated_at=func.now()). \
+            returning(BackgroundJob)
+        result = await self.session.execute(query)
+        jobs = result.scalars().all()
+        await self.session.commit()
+        return jobs
+
+    async def delete_finished(self, older_than_seconds: float) -> int:
+        """Delete Jobs finished more than 'older_than_seconds' ago
+
+        Returns
+        -------
+        int :
+            Number of deleted Jobs
+        """
+        query = delete(BackgroundJob). \
+            where(BackgroundJob.finished_at < func.now() - timedelta(seconds=older_than_seconds))
+        result = await self.session.execute(query)
+        await self.session.commit()
+        return result.rowcount
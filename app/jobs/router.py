@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from app.jobs.schemas import Job
+from app.jobs.repository import JobRepository
+from app.jobs.service import get_job, get_job_repo
+from app.monitoring.timing import TimedRoute
+from app.users.models import Roles
+from app.users.permissions import PermissionChecker
+
+job_router = APIRouter(prefix="/jobs", route_class=TimedRoute)
+
+
+@job_router.get('/{job_id}',
+                summary="Get state of {job_id} background job - only for ADMIN",
+                dependencies=[Depends(PermissionChecker([Roles.ADMIN_ROLE]))],
+                response_model=Job)
+async def get_job_status(job_id: str,
+                         repo: JobRepository = Depends(get_job_repo)):
+    """Router for getting state and progress of a background job.
+    Jobs are saved to DB, so any worker process knows them.
+    Accessible only for ADMIN"""
+    return await get_job(job_id, repo)
@@ -0,0 +1,26 @@
+import enum
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class JobStatus(str, enum.Enum):
+    """List of background job states"""
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class Job(BaseModel):
+    """Model to view state and progress of a background job"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    name: str
+    status: JobStatus = JobStatus.PENDING
+    # Number of rows processed so far and share of the work done from 0 to 1
+    processed: int = 0
+    progress: float = 0.0
+    created_at: datetime
+    finished_at: datetime | None = Field(default=None)
+    error: str | None = Field(default=None)
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+from fastapi import Depends, HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+from app.config import settings
+from app.database import async_session_maker, get_session
+from app.jobs.repository import JobRepository
+from app.jobs.schemas import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobFunction = Callable[..., Awaitable[Any]]
+# Functions of background jobs by name. Jobs are saved to DB with the name
+# and arguments of their function, so any worker can run them again
+job_functions: dict[str, JobFunction] = {}
+# Max number of abandoned jobs a worker takes over at once
+RESUME_BATCH_SIZE = 10
+# Tasks of jobs resumed by this worker, kept to not be garbage collected
+_resumed_tasks: set[asyncio.Task] = set()
+
+
+def job_function(func: JobFunction) -> JobFunction:
+    """Decorator to register a function of background jobs. Job functions
+    must be safe to run again from the start with the same JSON-compatible
+    arguments, since a job is resumed this way after its worker stops"""
+    job_functions[func.__name__] = func
+    return func
+
+
+async def get_job_repo(session: AsyncSession = Depends(get_session)) -> JobRepository:
+    """Service function to return class with Job operations"""
+    return JobRepository(session)
+
+
+async def create_job(name: str, func: JobFunction, *args: Any) -> Job:
+    """Service function to save a new pending job
+    Parameters
+    ----------
+    name :
+        Human-readable name of the job
+    func :
+        Registered job function
+    args :
+        JSON-compatible arguments of the function
+
+    Returns
+    -------
+    Job :
+        State of the saved job
+    """
+    if job_functions.get(func.__name__) is not func:
+        raise ValueError(f"Job function {func.__name__} is not registered")
+    job = Job(id=uuid.uuid4().hex, name=name, created_at=datetime.now(timezone.utc))
+    async with async_session_maker() as session:
+        await JobRepository(session).create(job, func.__name__, list(args))
+    return job
+
+
+async def get_job(job_id: str, repo: JobRepository) -> Job:
+    """Service function to return state of the job
+    Parameters
+    ----------
+    job_id :
+        ID of the job
+    repo :
+        Job repository
+
+    Returns
+    -------
+    Job :
+        State of the job
+    """
+    job = await repo.read(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Job is not found")
+    return Job.model_validate(job)
+
+
+async def save_job(job: Job) -> None:
+    """Service function to save state of the job in own session"""
+    async with async_session_maker() as session:
+        await JobRepository(session).save(job)
+
+
+async def _save_periodically(job: Job) -> None:
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        try:
+            await save_job(job)
+        except (OSError, SQLAlchemyError) as e:
+            logger.warning("State of job %s is not saved: %r", job.id, e)
+
+
+async def run_job(job: Job, func: JobFunction, *args: Any) -> None:
+    """Service function to run the job and save its state every
+    JOB_HEARTBEAT_SECONDS. Used as a background task, so errors are logged
+    and saved to the job. If the worker stops meanwhile, the job is left
+    unfinished and resumed by another worker
+    Parameters
+    ----------
+    job :
+        State of the job to update
+    func :
+        Coroutine function doing the work, it receives the job as the
+        first argument to report progress
+    args :
+        Other arguments of the function
+    """
+    job.status = JobStatus.RUNNING
+    await save_job(job)
+    heartbeat = asyncio.create_task(_save_periodically(job))
+    try:
+        await func(job, *args)
+    except Exception as e:
+        logger.exception("Job %s '%s' failed", job.id, job.name)
+        job.status = JobStatus.FAILED
+        job.error = str(e)
+    else:
+        job.status = JobStatus.DONE
+        job.progress = 1.0
+    finally:
+        heartbeat.cancel()
+    job.finished_at = datetime.now(timezone.utc)
+    await save_job(job)
+
+
+async def resume_jobs() -> list[Job]:
+    """Service function to take over jobs abandoned by stopped workers
+    and run them again in this worker
+
+    Returns
+    -------
+    list[Job] :
+        States of the resumed jobs
+    """
+    async with async_session_maker() as session:
+        stale_jobs = await JobRepository(session).claim_stale(settings.JOB_STALE_SECONDS,
+                                                              RESUME_BATCH_SIZE)
+    resumed = []
+    for stale_job in stale_jobs:
+        job = Job.model_validate(stale_job)
+        func = job_functions.get(stale_job.function)
+        if func is None:
+            job.status = JobStatus.FAILED
+            job.error = f"Job function {stale_job.function} is not registered"
+            job.finished_at = datetime.now(timezone.utc)
+            await save_job(job)
+            continue
+        logger.info("Job %s '%s' is resumed", job.id, job.name)
+        task = asyncio.create_task(run_job(job, func, *stale_job.arguments))
+        _resumed_tasks.add(task)
+        task.add_done_callback(_resumed_tasks.discard)
+        resumed.append(job)
+    return resumed
+
+
+async def watch_jobs() -> None:
+    """Resume abandoned jobs and delete old finished ones every
+    JOB_HEARTBEAT_SECONDS till cancelled. Jobs resumed by this worker
+    are cancelled with it and left for other workers"""
+    try:
+        while True:
+            try:
+                await resume_jobs()
+                async with async_session_maker() as session:
+                    await JobRepository(session).delete_finished(settings.JOB_RESULT_TTL)
+            except (OSError, SQLAlchemyError) as e:
+                logger.warning("Background jobs are not checked: %r", e)
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+    finally:
+        for task in list(_resumed_tasks):
+            task.cancel()
@@ -0,0 +1,173 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterable
+
+# Upper bounds of histogram buckets: request and DB time in seconds and
+# number of SQL statements per request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+@dataclass(slots=True)
+class RequestStats:
+    """Database usage and timings of the current request"""
+    statements: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    # Route template and when its endpoint has started and returned,
+    # set only by TimedRoute
+    route: str | None = None
+    endpoint_started: float | None = None
+    endpoint_finished: float | None = None
+
+
+# Stats of the request handled in the current context, None out of requests
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+class Histogram:
+    """Histogram of observed values split by labels. Observing only
+    increments counters, cumulative buckets are built on scrape"""
+    def __init__(self, name: str, documentation: str,
+                 label_names: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # Labels -> [count of every bucket and +Inf, sum of values]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = [*(str(bucket) for bucket in self.buckets), "+Inf"]
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                bucket_labels = _format_labels((*self.label_names, "le"), (*labels, bound))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{series_labels} {total}")
+            lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Current values split by labels"""
+    def __init__(self, name: str, documentation: str,
+                 label_names: tuple[str, ...], metric_type: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.metric_type = metric_type
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds",
+                            "Time to handle a request till the end of its response.",
+                            ("method", "route", "status"), LATENCY_BUCKETS)
+REQUEST_STATEMENTS = Histogram("http_request_db_statements",
+                               "Number of SQL statements executed by a request.",
+                               ("method", "route"), STATEMENT_BUCKETS)
+REQUEST_DB_TIME = Histogram("http_request_db_duration_seconds",
+                            "Total time of SQL statements executed by a request.",
+                            ("method", "route"), LATENCY_BUCKETS)
+REQUEST_POOL_WAIT = Histogram("http_request_db_pool_wait_seconds",
+                              "Total time a request waited for database connections.",
+                              ("method", "route"), LATENCY_BUCKETS)
+POOL_CONNECTIONS = Gauge("db_pool_connections",
+                         "Connections of a pool by state.", ("pool", "state"))
+POOL_WAITING = Gauge("db_pool_waiting_checkouts",
+                     "Checkouts waiting for a connection now.", ("pool",))
+POOL_WAIT_SECONDS = Gauge("db_pool_wait_seconds_total",
+                          "Total time of all checkouts of a pool.", ("pool",), "counter")
+POOL_TIMEOUTS = Gauge("db_pool_timeouts_total",
+                      "Checkouts of a pool failed by timeout.", ("pool",), "counter")
+RESPONSE_CACHE_LOOKUPS = Gauge("response_cache_lookups_total",
+                               "Lookups of the response cache by result.", ("result",), "counter")
+RESPONSE_CACHE_EVICTIONS = Gauge("response_cache_evictions_total",
+                                 "Responses evicted from the full response cache.", (), "counter")
+RESPONSE_CACHE_SIZE = Gauge("response_cache_size",
+                            "Cached responses and their total size.", ("unit",))
+REGISTRY = (REQUEST_LATENCY, REQUEST_STATEMENTS, REQUEST_DB_TIME, REQUEST_POOL_WAIT,
+            POOL_CONNECTIONS, POOL_WAITING, POOL_WAIT_SECONDS, POOL_TIMEOUTS,
+            RESPONSE_CACHE_LOOKUPS, RESPONSE_CACHE_EVICTIONS, RESPONSE_CACHE_SIZE)
+
+
+def render_metrics() -> str:
+    """Return all metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware which observes latency and database usage of
+    every HTTP request, labeled by the route template"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        observed = False
+
+        def observe():
+            nonlocal observed
+            observed = True
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method, path, str(status_code))
+            REQUEST_STATEMENTS.observe(stats.statements, method, path)
+            REQUEST_DB_TIME.observe(stats.db_seconds, method, path)
+            REQUEST_POOL_WAIT.observe(stats.pool_wait_seconds, method, path)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            # Background tasks run after the response, they are not counted
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not observed:
+                observe()
+            request_stats.reset(token)
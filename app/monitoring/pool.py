@@ -0,0 +1,44 @@
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+from app.monitoring.metrics import request_stats
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Connection pool which measures how long checkouts wait for a connection"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self.waiting -= 1
+            self.wait_count += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            stats = request_stats.get()
+            if stats is not None:
+                stats.pool_wait_seconds += wait
+
+    @property
+    def max_overflow(self) -> int:
+        """Max number of connections opened above the pool size, -1 if unlimited"""
+        return self._max_overflow
+
+    def is_saturated(self) -> bool:
+        """Check if all connections the pool may open are checked out"""
+        if self._max_overflow == -1:
+            return False
+        return self.checkedout() >= self.size() + self._max_overflow
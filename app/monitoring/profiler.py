@@ -0,0 +1,173 @@
+import asyncio
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from types import FrameType
+from typing import Any, Callable
+from fastapi import HTTPException, Request, Response
+from starlette import status
+from app.auth.service import ACCESS_TOKEN, check_user_auth, decode_token, oauth2_scheme
+from app.config import settings
+from app.database import async_session_maker
+from app.monitoring.schemas import Profile
+from app.users.models import Roles
+from app.users.repository import UserRepository
+
+# Header which asks to profile a request, only requests of ADMIN are profiled
+PROFILE_HEADER = "X-Profile"
+# Names of saved profiles, no paths are allowed
+PROFILE_NAME_PATTERN = re.compile(r"^[\w.-]+\.collapsed$")
+# Max depth of sampled stacks
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    for prefix in sys.path:
+        if prefix and filename.startswith(prefix):
+            filename = os.path.relpath(filename, prefix)
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _collapse(frames: list[FrameType]) -> str:
+    """Join frames from the outermost to the innermost one"""
+    return ";".join(_frame_label(frame) for frame in frames)
+
+
+def _awaited_frames(coro: Any) -> list[FrameType]:
+    """Return frames of a suspended coroutine and the coroutines it awaits"""
+    frames = []
+    while coro is not None and len(frames) < MAX_STACK_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) \
+            or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) \
+            or getattr(coro, "ag_await", None)
+    return frames
+
+
+class SamplingProfiler:
+    """Profiler sampling stacks of an asyncio task from a separate thread.
+    While the task is running the stack of the event loop thread is
+    recorded, while it's suspended the stack of its awaited coroutines is
+    recorded with '<await>' frame on top, so samples show wall-clock time"""
+    def __init__(self, task: asyncio.Task, interval: float):
+        self.task = task
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._thread_id = threading.get_ident()
+        self._loop = task.get_loop()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stopped.set()
+        self._sampler.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        if asyncio.current_task(self._loop) is self.task:
+            frame = sys._current_frames().get(self._thread_id)
+            frames = []
+            while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                frames.append(frame)
+                frame = frame.f_back
+            frames.reverse()
+            stack = _collapse(frames)
+        else:
+            frames = _awaited_frames(self.task.get_coro())
+            if not frames:
+                return
+            stack = _collapse(frames) + ";<await>"
+        self.samples[stack] += 1
+
+    def save(self, directory: str, name: str) -> str:
+        """Write samples in collapsed stack format, which is read by
+        flamegraph.pl and speedscope, and return the file name"""
+        os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        name = re.sub(r"[^\w-]+", "_", name).strip("_")
+        filename = f"{timestamp}_{name}.collapsed"
+        with open(os.path.join(directory, filename), "w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+        return filename
+
+
+async def is_profiling_allowed(request: Request) -> bool:
+    """Check if the request is sent by an authenticated ADMIN. Anonymous
+    requests are refused without DB lookups, and the User is usually
+    found in the cache of authenticated users"""
+    try:
+        claims = decode_token(await oauth2_scheme(request), ACCESS_TOKEN)
+        async with async_session_maker() as session:
+            user = await check_user_auth(UserRepository(session), claims)
+    except HTTPException:
+        return False
+    return user.role == Roles.ADMIN_ROLE
+
+
+def profiled(handler: Callable[[Request], Any], route_name: str) -> Callable[[Request], Any]:
+    """Wrap a route handler to profile requests of ADMIN with PROFILE_HEADER.
+    Name of the saved profile is returned in the same header of the response,
+    the header of other clients is ignored"""
+    async def profiled_handler(request: Request) -> Response:
+        if PROFILE_HEADER not in request.headers or not await is_profiling_allowed(request):
+            return await handler(request)
+        profiler = SamplingProfiler(asyncio.current_task(), settings.PROFILE_INTERVAL_MS / 1000)
+        with profiler:
+            response = await handler(request)
+        filename = profiler.save(settings.PROFILE_DIR, f"{request.method}_{route_name}")
+        response.headers[PROFILE_HEADER] = filename
+        return response
+    return profiled_handler
+
+
+def list_profiles() -> list[Profile]:
+    """Service function to return saved profiles from the newest one"""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    with os.scandir(settings.PROFILE_DIR) as entries:
+        for entry in entries:
+            if entry.is_file() and PROFILE_NAME_PATTERN.match(entry.name):
+                stat = entry.stat()
+                profiles.append(Profile(
+                    name=entry.name,
+                    size=stat.st_size,
+                    created_at=datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+                ))
+    return sorted(profiles, key=lambda profile: profile.name, reverse=True)
+
+
+def get_profile_path(name: str) -> str:
+    """Service function to return path of the saved profile
+    Parameters
+    ----------
+    name :
+        File name of the profile
+
+    Returns
+    -------
+    str :
+        Path of the profile file
+    """
+    path = os.path.join(settings.PROFILE_DIR, name)
+    if not PROFILE_NAME_PATTERN.match(name) or not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Profile is not found")
+    return path
@@ -0,0 +1,91 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+from app.monitoring.metrics import request_stats
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Describe bound parameters of a statement by their types and
+    sizes, without values
+    Parameters
+    ----------
+    parameters :
+        Parameters passed to the DBAPI cursor: a sequence, a mapping or
+        a list of them for executemany
+
+    Returns
+    -------
+    Any :
+        JSON-compatible shape, e.g. ["int", "str", "list[20]"]
+    """
+    if isinstance(parameters, dict):
+        return {key: parameter_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_shape(value) for value in parameters]
+    return _value_shape(parameters)
+
+
+def _value_shape(value: Any) -> str:
+    if isinstance(value, (list, tuple, set, frozenset, dict)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.statement_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    duration = time.perf_counter() - context.statement_start_time
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += duration
+    if settings.SLOW_QUERY_MS and duration * 1000 >= settings.SLOW_QUERY_MS:
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        slow_query_logger.warning(json.dumps({
+            "event": "slow_query",
+            "duration_ms": round(duration * 1000, 3),
+            "route": stats.route if stats is not None else None,
+            "statement": " ".join(statement.split()),
+            "parameters": parameter_shape(parameters),
+            "executemany": executemany,
+        }))
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Count SQL statements of the engine and their time in stats of
+    requests and log statements slower than SLOW_QUERY_MS"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_statements(*engines: AsyncEngine) -> Iterator[list[int]]:
+    """Count SQL statements executed by the engines meanwhile. Returns
+    a list with the number, callers reset it to count their own calls"""
+    counter = [0]
+
+    def after_cursor_execute(*args) -> None:
+        counter[0] += 1
+
+    for engine in engines:
+        event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from starlette import status
+from app.monitoring.profiler import get_profile_path, list_profiles
+from app.monitoring.schemas import PoolStatus, Profile, Readiness
+from app.monitoring.service import collect_metrics, get_engines, get_pool_status
+from app.monitoring.timing import TimedRoute
+from app.users.models import Roles
+from app.users.permissions import PermissionChecker
+
+monitoring_router = APIRouter(route_class=TimedRoute)
+
+
+@monitoring_router.get('/health/pool',
+                       summary="Get state of database connection pools",
+                       response_model=list[PoolStatus])
+async def get_pools():
+    """Router for getting checked out and idle connections and checkout
+    wait times of the primary and replica pools of this worker process"""
+    return [get_pool_status(name, pool_engine) for name, pool_engine in get_engines().items()]
+
+
+@monitoring_router.get('/health/ready',
+                       summary="Readiness probe",
+                       response_model=Readiness,
+                       responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": Readiness}})
+async def get_readiness():
+    """Router for readiness probes. Responds with 503 status while any
+    connection pool of this worker process is saturated"""
+    saturated = [name for name, pool_engine in get_engines().items()
+                 if pool_engine.pool.is_saturated()]
+    readiness = Readiness(ready=not saturated, saturated_pools=saturated)
+    if saturated:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content=readiness.model_dump())
+    return readiness
+
+
+@monitoring_router.get('/metrics',
+                       summary="Get metrics in Prometheus format",
+                       response_class=PlainTextResponse)
+async def get_metrics():
+    """Router for Prometheus scrapes. Returns latency, SQL statements and
+    DB time of requests by route and state of connection pools. Every
+    worker process reports its own metrics"""
+    return PlainTextResponse(collect_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@monitoring_router.get('/profiles',
+                       summary="Get list of saved request profiles - only for ADMIN",
+                       dependencies=[Depends(PermissionChecker([Roles.ADMIN_ROLE]))],
+                       response_model=list[Profile])
+async def get_profiles():
+    """Router for getting profiles of requests sent by ADMIN with
+    X-Profile header, from the newest one. Every worker process saves
+    profiles to its PROFILE_DIR. Accessible only for ADMIN"""
+    return list_profiles()
+
+
+@monitoring_router.get('/profiles/{name}',
+                       summary="Download {name} request profile - only for ADMIN",
+                       dependencies=[Depends(PermissionChecker([Roles.ADMIN_ROLE]))],
+                       response_class=FileResponse)
+async def get_profile(name: str):
+    """Router for downloading a profile in collapsed stack format, which
+    can be opened by speedscope or flamegraph.pl. Accessible only for ADMIN"""
+    return FileResponse(get_profile_path(name), media_type="text/plain", filename=name)
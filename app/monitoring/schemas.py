@@ -0,0 +1,33 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class PoolStatus(BaseModel):
+    """Model to view state of a connection pool"""
+    name: str
+    size: int
+    max_overflow: int
+    checked_out: int
+    idle: int
+    overflow: int
+    saturated: bool
+    # Checkouts waiting for a connection right now and statistics of
+    # all checkouts since the pool was created
+    waiting: int
+    wait_count: int
+    wait_ms_mean: float
+    wait_ms_max: float
+    timeouts: int
+
+
+class Readiness(BaseModel):
+    """Model to view if the service is ready to accept requests"""
+    ready: bool
+    saturated_pools: list[str]
+
+
+class Profile(BaseModel):
+    """Model to view a saved profile of a request"""
+    name: str
+    size: int
+    created_at: datetime
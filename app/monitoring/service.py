@@ -0,0 +1,66 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.adv.cache import adv_cache
+from app.database import engine, replica_engines
+from app.monitoring.metrics import (
+    POOL_CONNECTIONS, POOL_TIMEOUTS, POOL_WAIT_SECONDS, POOL_WAITING, RESPONSE_CACHE_EVICTIONS,
+    RESPONSE_CACHE_LOOKUPS, RESPONSE_CACHE_SIZE, render_metrics
+)
+from app.monitoring.schemas import PoolStatus
+
+
+def get_engines() -> dict[str, AsyncEngine]:
+    """Service function to return all database engines by their names"""
+    engines = {"primary": engine}
+    for number, replica_engine in enumerate(replica_engines, start=1):
+        engines[f"replica{number}"] = replica_engine
+    return engines
+
+
+def get_pool_status(name: str, pool_engine: AsyncEngine) -> PoolStatus:
+    """Service function to return state of the engine's connection pool
+    Parameters
+    ----------
+    name :
+        Name of the engine
+    pool_engine :
+        Engine using InstrumentedPool
+
+    Returns
+    -------
+    PoolStatus :
+        Connections and checkout wait statistics of the pool
+    """
+    pool = pool_engine.pool
+    return PoolStatus(
+        name=name,
+        size=pool.size(),
+        max_overflow=pool.max_overflow,
+        checked_out=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        saturated=pool.is_saturated(),
+        waiting=pool.waiting,
+        wait_count=pool.wait_count,
+        wait_ms_mean=round(pool.wait_seconds_total / pool.wait_count * 1000, 3) if pool.wait_count else 0.0,
+        wait_ms_max=round(pool.wait_seconds_max * 1000, 3),
+        timeouts=pool.timeouts,
+    )
+
+
+def collect_metrics() -> str:
+    """Service function to update pool and response cache gauges and
+    return all metrics in Prometheus text exposition format"""
+    for name, pool_engine in get_engines().items():
+        pool = pool_engine.pool
+        POOL_CONNECTIONS.set(pool.checkedout(), name, "checked_out")
+        POOL_CONNECTIONS.set(pool.checkedin(), name, "idle")
+        POOL_WAITING.set(pool.waiting, name)
+        POOL_WAIT_SECONDS.set(pool.wait_seconds_total, name)
+        POOL_TIMEOUTS.set(pool.timeouts, name)
+    responses = adv_cache.responses
+    RESPONSE_CACHE_LOOKUPS.set(responses.hits, "hit")
+    RESPONSE_CACHE_LOOKUPS.set(responses.misses, "miss")
+    RESPONSE_CACHE_EVICTIONS.set(responses.evictions)
+    RESPONSE_CACHE_SIZE.set(len(responses), "responses")
+    RESPONSE_CACHE_SIZE.set(responses.size, "bytes")
+    return render_metrics()
@@ -0,0 +1,70 @@
+import functools
+import inspect
+import time
+from typing import Any, Callable
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from app.config import settings
+from app.monitoring.metrics import RequestStats, request_stats
+from app.monitoring.profiler import profiled
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an async endpoint to mark when it starts and returns"""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        stats = request_stats.get()
+        if stats is not None:
+            stats.endpoint_started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if stats is not None:
+                stats.endpoint_finished = time.perf_counter()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """Route which adds a Server-Timing header with time of request phases:
+    dependency resolution, the endpoint itself, SQL statements and response
+    encoding, and names the route in the slow-query log. Routes are plain
+    APIRoutes unless SERVER_TIMING_ENABLED or SLOW_QUERY_MS is set. Requests
+    of ADMIN asking for it are profiled if PROFILER_ENABLED is set"""
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if settings.SERVER_TIMING_ENABLED and inspect.iscoroutinefunction(endpoint):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        handler = self._get_timed_handler()
+        if settings.PROFILER_ENABLED:
+            handler = profiled(handler, self.path)
+        return handler
+
+    def _get_timed_handler(self) -> Callable[[Request], Any]:
+        handler = super().get_route_handler()
+        if not (settings.SERVER_TIMING_ENABLED or settings.SLOW_QUERY_MS):
+            return handler
+
+        async def timed_handler(request: Request) -> Response:
+            stats = request_stats.get()
+            if stats is None:
+                stats = RequestStats()
+                request_stats.set(stats)
+            stats.route = self.path
+            start = time.perf_counter()
+            response = await handler(request)
+            if not settings.SERVER_TIMING_ENABLED:
+                return response
+            finish = time.perf_counter()
+            started = stats.endpoint_started or start
+            finished = stats.endpoint_finished or finish
+            response.headers["Server-Timing"] = ", ".join((
+                f"deps;dur={(started - start) * 1000:.3f}",
+                f"app;dur={(finished - started) * 1000:.3f}",
+                f'db;dur={stats.db_seconds * 1000:.3f};desc="{stats.statements} statements"',
+                f"encode;dur={(finish - finished) * 1000:.3f}",
+                f"total;dur={(finish - start) * 1000:.3f}",
+            ))
+            return response
+        return timed_handler
@@ -0,0 +1,103 @@
+import base64
+import json
+import math
+from typing import Any, Callable, Generic, Sequence, TypeVar
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+from starlette import status
+
+# Default number of items on a page if client doesn't set 'limit'
+DEFAULT_PAGE_LIMIT = 20
+# Hard cap of items on one page for every paginated endpoint
+MAX_PAGE_LIMIT = 100
+# Range of IDs in cursors, IDs are BIGINT columns
+MIN_CURSOR_ID = -2 ** 63
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+ItemType = TypeVar("ItemType")
+
+
+class Page(BaseModel, Generic[ItemType]):
+    """Model to view one page of items with an opaque cursor of the next page"""
+    items: list[ItemType]
+    next: str | None = Field(default=None)
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode keyset values of the last item on a page into an opaque cursor
+    Parameters
+    ----------
+    values :
+        Values of the sort key of the last item (e.g. its ID)
+
+    Returns
+    -------
+    str :
+        An url-safe cursor string
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_value(value: Any, value_type: type) -> int | float | None:
+    """Return a keyset value of the type, None if it's not valid"""
+    if value_type is int:
+        if type(value) is int and MIN_CURSOR_ID <= value <= MAX_CURSOR_ID:
+            return value
+    elif value_type is float:
+        if type(value) in (int, float) and math.isfinite(value):
+            return float(value)
+    return None
+
+
+def decode_cursor(cursor: str, types: tuple[type, ...] = (int,)) -> list:
+    """Decode keyset values from an opaque cursor
+    Parameters
+    ----------
+    cursor :
+        A cursor string which was returned as 'next' field of a page
+    types :
+        Types of values the cursor must contain: int for IDs, which must
+        fit BIGINT, or float
+
+    Returns
+    -------
+    list :
+        Values of the sort key of the last item of a previous page
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, RecursionError):
+        values = None
+    if isinstance(values, list) and len(values) == len(types):
+        values = [_decode_value(value, value_type) for value, value_type in zip(values, types)]
+        if None not in values:
+            return values
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Cursor is not valid")
+
+
+def build_page(items: Sequence, limit: int,
+               cursor_key: Callable[[Any], tuple]) -> dict:
+    """Cut a page from items and generate a cursor of the next page
+    Parameters
+    ----------
+    items :
+        Items fetched from database with 'limit + 1' to find out
+        whether there is a next page
+    limit :
+        Number of items on a page
+    cursor_key :
+        Function returning keyset values of an item to encode in cursor
+
+    Returns
+    -------
+    dict :
+        Page data with 'items' and 'next' keys
+    """
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(*cursor_key(items[-1]))
+    return {"items": items, "next": next_cursor}
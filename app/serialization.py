@@ -0,0 +1,57 @@
+from operator import attrgetter
+from typing import Any, Iterable
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+class RawJSONResponse(Response):
+    """Response with a body which is already encoded to JSON"""
+    media_type = "application/json"
+
+
+class Serializer:
+    """Serializer of trusted objects (e.g. rows loaded from database) to
+    JSON by fields of a pydantic model. Values are read by a getter
+    compiled once for all the fields and encoded by pydantic_core without
+    validating every object against the model, so it must only be used
+    for objects which are valid by construction"""
+    def __init__(self, model: type[BaseModel], **nested: "Serializer"):
+        self.fields = tuple(model.model_fields)
+        self.nested = nested
+        getter = attrgetter(*self.fields)
+        # attrgetter of a single field returns the value instead of a tuple
+        self._values = getter if len(self.fields) > 1 else lambda obj: (getter(obj),)
+
+    def to_dict(self, obj: Any) -> dict:
+        """Return a dict of JSON-compatible values of the object fields"""
+        data = dict(zip(self.fields, self._values(obj)))
+        for field, serializer in self.nested.items():
+            value = data[field]
+            if value is not None:
+                data[field] = serializer.to_list(value)
+        return data
+
+    def to_list(self, objs: Iterable[Any]) -> list[dict]:
+        to_dict = self.to_dict
+        return [to_dict(obj) for obj in objs]
+
+    def response(self, objs: Iterable[Any], status_code: int = 200) -> RawJSONResponse:
+        """Return a response with a JSON list of the objects
+        Parameters
+        ----------
+        objs :
+            Trusted objects with attributes of all fields of the model
+        status_code :
+            Status code of the response
+
+        Returns
+        -------
+        RawJSONResponse :
+            A response which is sent as is, skipping response_model of the route
+        """
+        return RawJSONResponse(to_json(self.to_list(objs)), status_code=status_code)
+
+    def page_response(self, page: dict) -> RawJSONResponse:
+        """Return a response with a page built by app.pagination.build_page"""
+        return RawJSONResponse(to_json({"items": self.to_list(page["items"]), "next": page["next"]}))
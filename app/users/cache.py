@@ -0,0 +1,121 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Hashable
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import TTLCache, invalidation_listener, notify
+from app.config import settings
+from app.users.schemas import UserPrincipal
+
+# Postgres channel of usernames of changed users, every worker listens to
+# it and drops them from its cache
+INVALIDATION_CHANNEL = "principal_cache_invalidation"
+# Invalidations are remembered for this long to reject users read before
+# them, at most this many ones
+INVALIDATION_HISTORY_SECONDS = 60
+INVALIDATION_HISTORY_SIZE = 10000
+# Notifications are sent with this ID of the worker process to skip its own
+# ones, it updates the cache itself after commit
+WORKER_ID = uuid.uuid4().hex
+
+
+class PrincipalCache(TTLCache):
+    """Cache of authenticated users by username with their current token
+    version. Users are returned only while the worker listens to
+    invalidations of other workers, and a user read from DB is not cached
+    if it has changed since its read has started"""
+    def __init__(self, max_size: int, ttl: float):
+        super().__init__(max_size, ttl)
+        self.listening = False
+        # Times of recent invalidations by username, oldest first
+        self._invalidated: OrderedDict[str, float] = OrderedDict()
+        self._forgotten_at = 0.0
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return a cached User or None if it is missing or caching is off"""
+        if not self.listening:
+            return None
+        return super().get(key)
+
+    def set_read(self, username: str, principal: UserPrincipal, started: float) -> None:
+        """Cache a User read from DB
+        Parameters
+        ----------
+        username :
+            Username of the User
+        principal :
+            Data of the User
+        started :
+            time.monotonic() before the User has been read
+        """
+        if started > self._forgotten_at and self._invalidated.get(username, 0.0) < started:
+            self.set(username, principal)
+
+    def replace(self, username: str, principal: UserPrincipal) -> None:
+        """Cache a User changed by this worker after commit, rejecting
+        the reads of it started before"""
+        self.invalidate(username)
+        self.set(username, principal)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a User from the cache and reject the reads of it started before"""
+        super().invalidate(key)
+        now = time.monotonic()
+        self._invalidated[key] = now
+        self._invalidated.move_to_end(key)
+        while (len(self._invalidated) > INVALIDATION_HISTORY_SIZE or
+               next(iter(self._invalidated.values())) < now - INVALIDATION_HISTORY_SECONDS):
+            _, invalidated_at = self._invalidated.popitem(last=False)
+            self._forgotten_at = max(self._forgotten_at, invalidated_at)
+
+    def clear(self) -> None:
+        """Remove all Users and reject the reads started before"""
+        super().clear()
+        self._invalidated.clear()
+        self._forgotten_at = time.monotonic()
+
+
+# Cache of this worker process, must be updated on every user change
+principal_cache = PrincipalCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+
+def revoke_principal(principal: UserPrincipal) -> None:
+    """Make this worker reject tokens of a renamed or deleted user
+    till they expire
+    Parameters
+    ----------
+    principal :
+        Data of the User before renaming or deleting
+    """
+    principal_cache.replace(principal.username, principal.model_copy(
+        update={"is_active": False, "token_version": principal.token_version + 1}
+    ))
+
+
+async def publish_invalidation(session: AsyncSession, *usernames: str) -> None:
+    """Notify other workers about changed Users. Notifications are delivered
+    when the transaction of the session is committed
+    Parameters
+    ----------
+    session :
+        Session of the transaction changing the Users
+    usernames :
+        Usernames of the changed Users, old and new ones for a renamed User
+    """
+    for username in usernames:
+        await notify(session, INVALIDATION_CHANNEL, f"{WORKER_ID} {username}")
+
+
+def _on_notification(payload: str) -> None:
+    worker_id, username = payload.split(" ", 1)
+    if worker_id != WORKER_ID:
+        principal_cache.invalidate(username)
+
+
+def _on_listening(listening: bool) -> None:
+    if listening:
+        principal_cache.clear()
+    principal_cache.listening = listening
+
+
+invalidation_listener.subscribe(INVALIDATION_CHANNEL, _on_notification, _on_listening)
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import BigInteger, Enum, Boolean, String
+from sqlalchemy import BigInteger, Enum, Boolean, String, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 
@@ -21,11 +21,16 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(50), nullable=True)
     role: Mapped[str] = mapped_column(Enum(Roles, name="role"), default=Roles.USER_ROLE)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Incremented to revoke all tokens issued to the user before
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
+    # Relationships are never loaded implicitly, queries set loader options if they need them
     advertisements: Mapped[list["Adv"]] = relationship("Adv",
+                                                       lazy="raise",
                                                        back_populates="author",
                                                        passive_deletes=True)
     comments: Mapped[list["Comment"]] = relationship("Comment",
+                                                     lazy="raise",
                                                      back_populates="author",
                                                      passive_deletes=True)
 
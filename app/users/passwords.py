@@ -0,0 +1,68 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+from app.config import settings
+
+# Instance of helper context class to hash and verify passwords
+pwd_context = CryptContext(schemes=["bcrypt"])
+
+# Pool to run CPU-heavy bcrypt calls off the event loop, created on first use
+_executor: Executor | None = None
+# Limits number of bcrypt calls in progress, others wait without blocking the loop
+_semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+
+
+def _get_executor() -> Executor:
+    """Return the pool configured by PASSWORD_HASH_EXECUTOR setting"""
+    global _executor
+    if _executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS,
+                                           thread_name_prefix="bcrypt")
+    return _executor
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password in the worker pool
+    Parameters
+    ----------
+    password :
+        A plain password
+
+    Returns
+    -------
+    str :
+        A bcrypt hash of the password
+    """
+    async with _semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _hash, password)
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    """Verify a password against its hash in the worker pool
+    Parameters
+    ----------
+    password :
+        A plain password
+    password_hash :
+        A bcrypt hash from database
+
+    Returns
+    -------
+    bool :
+        True if the password is correct, False otherwise
+    """
+    async with _semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _verify, password, password_hash)
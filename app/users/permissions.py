@@ -1,9 +1,8 @@
 from fastapi import Depends, HTTPException
 from starlette import status
-from app import User, Adv
 from app.auth.service import check_user_auth
-from app.comments.models import Comment
 from app.users.models import Roles
+from app.users.schemas import UserPrincipal
 
 
 class PermissionChecker:
@@ -11,7 +10,7 @@ class PermissionChecker:
     def __init__(self, access_roles_list: list[str]):
         self.access_roles = access_roles_list
 
-    def __call__(self, current_user: User = Depends(check_user_auth)):
+    def __call__(self, current_user: UserPrincipal = Depends(check_user_auth)):
         for role in self.access_roles:
             if role not in current_user.role:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
@@ -19,22 +18,20 @@ class PermissionChecker:
         return True
 
 
-def check_owner_or_admin(item_instance: Adv | Comment, user_instance: User) -> bool:
-    """Check user permission to get access to some methods (e.g. put, delete)
+def owner_filter(user_instance: UserPrincipal) -> int | None:
+    """Return author ID to restrict changes (e.g. put, delete) to items of
+    the user. Used by repositories in WHERE clause of UPDATE and DELETE
+    statements, so access is checked without reading items first
     Parameters
     ----------
-    item_instance :
-        An instance of Adv or Comment class
     user_instance :
-        A current user instance, whose role need to be checked
+        A current user, whose role need to be checked
 
     Returns
     -------
-    bool :
-        True if user has rights, False otherwise
+    int | None :
+        ID of the user, None if the user is ADMIN and can change any item
     """
-    if (item_instance.author_id == user_instance.id) \
-            or (user_instance.role == Roles.ADMIN_ROLE):
-        return True
-    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                        detail="You don't have access")
+    if user_instance.role == Roles.ADMIN_ROLE:
+        return None
+    return user_instance.id
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+from app.adv.records import AdvRecord
+from app.users.models import Roles
+
+
+@dataclass(slots=True, frozen=True)
+class UserRecord:
+    """Read-only row of a user with advertisements without ORM state"""
+    id: int
+    username: str
+    fullname: str | None
+    email: str | None
+    role: Roles
+    is_active: bool
+    advertisements: list[AdvRecord]
@@ -1,21 +1,23 @@
+import time
 from typing import Sequence
-from passlib.context import CryptContext
 from sqlalchemy import select, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app import User
-from app.users.schemas import UserCreate, UserUpdate, UserUpdateAdmin
-
-# Instance of helper context class to hash and verify passwords
-pwd_context = CryptContext(schemes=["bcrypt"])
-
+from app import Adv, User
+from app.adv.records import AdvRecord
+from app.adv.repository import ADV_RECORD_COLUMNS
+from app.users.passwords import hash_password
+from app.users.cache import principal_cache, publish_invalidation, revoke_principal
+from app.users.records import UserRecord
+from app.users.schemas import UserCreate, UserUpdate, UserUpdateAdmin, UserPrincipal
 
 class UserRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    def create(self, user_data: UserCreate) -> User:
-        """Create a new User
+    async def create(self, user_data: UserCreate) -> User:
+        """Create a new User. Password is hashed in a worker pool, so
+        release the session connection before
         Parameters
         ----------
         user_data :
@@ -26,29 +28,57 @@ class UserRepository:
         User :
             A new instance of the User class
         """
-        user_password = pwd_context.hash(user_data.password)
+        user_password = await hash_password(user_data.password)
         new_user = User(username=user_data.username, password=user_password)
         self.session.add(new_user)
         return new_user
 
-    async def read(self, username: str) -> User:
+    async def read(self, username: str, with_advertisements: bool = False) -> User:
         """Return a User by username from DB
         Parameters
         ----------
         username :
             Username attribute of User instance
+        with_advertisements :
+            Load User's advertisements too if True
 
         Returns
         -------
         User :
             An instance of the User class from database
         """
-        query = select(User).\
-            where(User.username == username).\
-            options(selectinload(User.advertisements))
+        query = select(User).where(User.username == username)
+        if with_advertisements:
+            query = query.options(selectinload(User.advertisements))
         result = await self.session.execute(query)
         return result.scalar()
 
+    async def read_principal(self, username: str) -> UserPrincipal | None:
+        """Return an authenticated User data by username from DB and refresh
+        its token version in cache
+        Parameters
+        ----------
+        username :
+            Username attribute of User instance
+
+        Returns
+        -------
+        UserPrincipal :
+            Identity, role, status and token version of the User,
+            None if it doesn't exist
+        """
+        query = select(User.id, User.username, User.role, User.is_active, User.token_version).\
+            where(User.username == username)
+        started = time.monotonic()
+        result = await self.session.execute(query)
+        row = result.first()
+        if row is None:
+            principal_cache.invalidate(username)
+            return None
+        principal = UserPrincipal.model_validate(row)
+        principal_cache.set_read(username, principal, started)
+        return principal
+
     async def read_all(self) -> Sequence[User]:
         """Return list of all User instances
         Returns
@@ -60,69 +90,141 @@ class UserRepository:
         result = await self.session.execute(query)
         return result.scalars().all()
 
+    async def read_all_records(self) -> list[UserRecord]:
+        """Return all users with their advertisements as read-only records.
+        Only viewed columns are selected and no ORM instances are built
+        Returns
+        -------
+        UserRecord :
+            Records of all users ordered by ID
+        """
+        query = select(User.id, User.username, User.fullname, User.email, User.role, User.is_active).\
+            order_by(User.id)
+        users = (await self.session.execute(query)).all()
+        advertisements = {user.id: [] for user in users}
+        query = select(*ADV_RECORD_COLUMNS).order_by(Adv.author_id, Adv.id)
+        for row in await self.session.execute(query):
+            author_advertisements = advertisements.get(row.author_id)
+            if author_advertisements is not None:
+                author_advertisements.append(AdvRecord(*row))
+        return [UserRecord(*user, advertisements[user.id]) for user in users]
+
     async def update(self,
                      user_data: UserUpdate,
-                     user_instance: User) -> User:
-        """Update a User info
+                     user: UserPrincipal) -> User | None:
+        """Update a User info with a single UPDATE ... RETURNING statement
         Parameters
         ----------
         user_data :
             Data of pydantic class UserCreate to update the User
-        user_instance :
-            An instance of User to change
+        user :
+            Current data of the User to change
+
+        Returns
+        -------
+        User :
+            A changed instance of the User class, None if it doesn't exist
+        """
+        values = user_data.model_dump(exclude_unset=True)
+        if not values:
+            return await self.read(user.username, with_advertisements=True)
+        if "password" in values:
+            values["password"] = await hash_password(values["password"])
+        if "username" in values or "password" in values:
+            # Tokens are bound to username and issued for the password
+            values["token_version"] = User.token_version + 1
+        query = update(User). \
+            where(User.id == user.id). \
+            values(**values). \
+            returning(User). \
+            options(selectinload(User.advertisements))
+        result = await self.session.execute(query)
+        user_instance = result.scalar()
+        if user_instance is not None:
+            await publish_invalidation(self.session, *{user.username, user_instance.username})
+        await self.session.commit()
+        if user_instance is None:
+            return None
+        if user.username != user_instance.username:
+            revoke_principal(user)
+        principal_cache.replace(user_instance.username, UserPrincipal.model_validate(user_instance))
+        return user_instance
+
+    async def deactivate(self, user_id: int) -> User | None:
+        """Block a User and revoke all tokens issued to the User before
+        Parameters
+        ----------
+        user_id :
+            ID of the User
 
         Returns
         -------
         User :
-            A changed instance of the User class
+            A changed instance of the User class, None if it doesn't exist
         """
-        if not user_data.model_dump(exclude_unset=True):
-            return user_instance
         query = update(User). \
-            where(User.id == user_instance.id). \
-            values(**user_data.model_dump(exclude_unset=True))
-        await self.session.execute(query)
-        await self.session.refresh(user_instance)
+            where(User.id == user_id). \
+            values(is_active=False, token_version=User.token_version + 1). \
+            returning(User)
+        result = await self.session.execute(query)
+        user_instance = result.scalar()
+        if user_instance is not None:
+            await publish_invalidation(self.session, user_instance.username)
         await self.session.commit()
+        if user_instance is not None:
+            principal_cache.replace(user_instance.username,
+                                UserPrincipal.model_validate(user_instance))
         return user_instance
 
-    async def delete(self, username: str) -> User:
-        """Delete a User
+    async def delete(self, user_id: int) -> User | None:
+        """Delete a User. Usernames are reused after deletion, so the User
+        is found by ID
         Parameters
         ----------
-        username :
-            Username attribute of User instance
+        user_id :
+            ID of the User
 
         Returns
         -------
         User :
-            Deleted instance of the User class
+            Deleted instance of the User class, None if it doesn't exist
         """
-        query = delete(User).where(User.username == username).returning(User)
-        user = await self.session.execute(query)
+        query = delete(User).where(User.id == user_id).returning(User)
+        result = await self.session.execute(query)
+        user = result.scalar()
+        if user:
+            await publish_invalidation(self.session, user.username)
         await self.session.commit()
-        return user.scalar()
+        if user:
+            revoke_principal(UserPrincipal.model_validate(user))
+        return user
 
-    async def update_restricted(self,
-                                user_data: UserUpdateAdmin,
-                                user_instance: User) -> User:
-        """Update restricted User data (e.g. User role and status)
+    async def update_restricted(self, user_data: UserUpdateAdmin) -> User | None:
+        """Update restricted User data (e.g. User role and status) with
+        a single UPDATE ... RETURNING statement
         Parameters
         ----------
         user_data :
-            Data of pydantic class UserUpdateAdmin to update the User
-        user_instance :
-            An instance of User to change
+            Data of pydantic class UserUpdateAdmin with username of the User
+            and data to update
 
         Returns
         -------
         User :
-            A changed instance of the User class
+            A changed instance of the User class, None if it doesn't exist
         """
         query = update(User). \
-            where(User.id == user_instance.id). \
-            values(**user_data.model_dump(exclude_unset=True))
-        await self.session.execute(query)
-        await self.session.refresh(user_instance)
+            where(User.username == user_data.username). \
+            values(**user_data.model_dump(exclude_unset=True, exclude={"username"}),
+                   token_version=User.token_version + 1). \
+            returning(User). \
+            options(selectinload(User.advertisements))
+        result = await self.session.execute(query)
+        user_instance = result.scalar()
+        if user_instance is not None:
+            await publish_invalidation(self.session, user_instance.username)
         await self.session.commit()
+        if user_instance is not None:
+            principal_cache.replace(user_instance.username,
+                                UserPrincipal.model_validate(user_instance))
         return user_instance
@@ -1,23 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from starlette import status
 
 from app.auth.service import check_user_auth
-from app.users.models import User, Roles
+from app.jobs.schemas import Job
+from app.jobs.service import create_job, run_job
+from app.monitoring.timing import TimedRoute
+from app.users.models import Roles
 from app.users.permissions import PermissionChecker
 from app.users.repository import UserRepository
-from app.users.schemas import UserBase, UserUpdate, UserFullInfo, UserUpdateAdmin
-from app.users.service import get_user_repo
+from app.users.schemas import UserBase, UserUpdate, UserFullInfo, UserUpdateAdmin, UserPrincipal, \
+    user_full_info_serializer
+from app.users.service import get_user_repo, get_user_read_repo, delete_user_data
 
-user_router = APIRouter(prefix="/users")
+user_router = APIRouter(prefix="/users", route_class=TimedRoute)
 
 
 @user_router.get('/me',
                  summary="Get authorized User profile info",
                  response_model=UserBase)
-async def get_user(repo: UserRepository = Depends(get_user_repo),
-                   current_user: User = Depends(check_user_auth)):
+async def get_user(repo: UserRepository = Depends(get_user_read_repo),
+                   current_user: UserPrincipal = Depends(check_user_auth)):
     """Router for getting current user profile information"""
-    res = await repo.read(current_user.username)
+    res = await repo.read(current_user.username, with_advertisements=True)
     return res
 
 
@@ -26,19 +30,29 @@ async def get_user(repo: UserRepository = Depends(get_user_repo),
                  response_model=UserBase)
 async def change_user(user_data: UserUpdate,
                       repo: UserRepository = Depends(get_user_repo),
-                      current_user: User = Depends(check_user_auth)):
+                      current_user: UserPrincipal = Depends(check_user_auth)):
     """Router for changing current user profile information"""
     return await repo.update(user_data, current_user)
 
 
 @user_router.delete('/me',
                     summary="Delete authorized User",
-                    )
-async def delete_user(repo: UserRepository = Depends(get_user_repo),
-                      current_user: User = Depends(check_user_auth)):
-    """Router for deleting current user"""
-    await repo.delete(current_user.username)
-    return f"{current_user.username}, your account has been deleted successfully"
+                    status_code=status.HTTP_202_ACCEPTED,
+                    response_model=Job)
+async def delete_user(background_tasks: BackgroundTasks,
+                      repo: UserRepository = Depends(get_user_repo),
+                      current_user: UserPrincipal = Depends(check_user_auth)):
+    """Router for deleting current user. The deletion job is saved before
+    the account is blocked, so it's finished even if the worker stops.
+    Then the user with all comments and advertisements is deleted by
+    the background job"""
+    job = await create_job(f"Delete '{current_user.username}' user", delete_user_data, current_user.id)
+    user = await repo.deactivate(current_user.id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="User is not found")
+    background_tasks.add_task(run_job, job, delete_user_data, user.id)
+    return job
 
 
 @user_router.get('/list',
@@ -47,7 +61,7 @@ async def delete_user(repo: UserRepository = Depends(get_user_repo),
                  response_model=list[UserFullInfo])
 async def get_all_users(repo: UserRepository = Depends(get_user_repo)):
     """Router for getting user profile information"""
-    return await repo.read_all()
+    return user_full_info_serializer.response(await repo.read_all_records())
 
 
 @user_router.post('/change',
@@ -57,8 +71,8 @@ async def get_all_users(repo: UserRepository = Depends(get_user_repo)):
 async def change_users_restricted_data(user_data: UserUpdateAdmin,
                                        repo: UserRepository = Depends(get_user_repo)):
     """Router for changing restricted User information (e.g. role and status) by ADMIN"""
-    user = await repo.read(user_data.username)
+    user = await repo.update_restricted(user_data)
     if not user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="User is not found, check 'username' field")
-    return await repo.update_restricted(user_data, user)
+    return user
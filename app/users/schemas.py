@@ -1,5 +1,6 @@
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
-from app.adv.schemas import AdvBase
+from app.adv.schemas import AdvBase, adv_serializer
+from app.serialization import Serializer
 from app.users.models import Roles
 
 
@@ -35,8 +36,23 @@ class UserFullInfo(UserBase):
     is_active: bool
 
 
+# Serializer of User instances loaded from database with their advertisements
+user_full_info_serializer = Serializer(UserFullInfo, advertisements=adv_serializer)
+
+
 class UserUpdateAdmin(BaseModel):
     """Extended model to update user restricted data by Admin"""
     username: str
     role: Roles = Field(default=None)
     is_active: bool = Field(default=None)
+
+
+class UserPrincipal(BaseModel):
+    """Model of authenticated user which is cached between requests"""
+    id: int
+    username: str
+    role: Roles
+    is_active: bool
+    token_version: int
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
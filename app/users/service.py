@@ -1,9 +1,58 @@
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_session
+from app.adv.repository import AdvRepository
+from app.comments.repository import CommentRepository
+from app.config import settings
+from app.database import get_session, get_read_session, async_session_maker
+from app.jobs.schemas import Job
+from app.jobs.service import job_function
 from app.users.repository import UserRepository
 
 
 async def get_user_repo(session: AsyncSession = Depends(get_session)) -> UserRepository:
     """Service function to return class with User CRUD operations"""
     return UserRepository(session)
+
+
+async def get_user_read_repo(session: AsyncSession = Depends(get_read_session)) -> UserRepository:
+    """Service function to return class with User read operations on a replica"""
+    return UserRepository(session)
+
+
+@job_function
+async def delete_user_data(job: Job, user_id: int) -> None:
+    """Service function to delete a User with all comments and advertisements.
+    The User is deactivated first, so no new rows are added meanwhile.
+    Then rows are deleted in transactions of at most DELETE_BATCH_SIZE
+    rows: comments of the User, then advertisements of the User with their
+    comments, and the User row last. Every step is safe to repeat, so the
+    job is resumed from the start after a restart. Uses own session since
+    it runs as a background job after the request is closed
+    Parameters
+    ----------
+    job :
+        State of the job to report progress
+    user_id :
+        ID of the User
+    """
+    batch_size = settings.DELETE_BATCH_SIZE
+    async with async_session_maker() as session:
+        user_repo = UserRepository(session)
+        if await user_repo.deactivate(user_id) is None:
+            return
+        comment_repo = CommentRepository(session)
+        adv_repo = AdvRepository(session)
+        deleted = batch_size
+        while deleted == batch_size:
+            deleted = await comment_repo.delete_by_author(user_id, batch_size)
+            job.processed += deleted
+        adv_ids = await adv_repo.read_ids_by_author(user_id, batch_size)
+        while adv_ids:
+            deleted = batch_size
+            while deleted == batch_size:
+                deleted = await comment_repo.delete_by_advs(adv_ids, batch_size)
+                job.processed += deleted
+            job.processed += await adv_repo.delete_by_ids(adv_ids)
+            adv_ids = await adv_repo.read_ids_by_author(user_id, batch_size, adv_ids[-1])
+        await user_repo.delete(user_id)
+        job.processed += 1
@@ -0,0 +1,88 @@
+import json
+import statistics
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Sequence
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import async_session_maker
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """Return the percentile of values using nearest-rank method
+    Parameters
+    ----------
+    values :
+        Measured values, e.g. latencies in milliseconds
+    percent :
+        Percentile to return in range 0..100
+
+    Returns
+    -------
+    float :
+        The value below which 'percent' of values fall
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(percent / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies: Sequence[float]) -> dict:
+    """Return count, mean and p50/p95/p99 of latencies in milliseconds"""
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+@asynccontextmanager
+async def make_client(url: str | None) -> AsyncIterator[httpx.AsyncClient]:
+    """Return a client to a running server or to the app in process. The
+    lifespan of the app is run meanwhile, so its caches work as on a server"""
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            yield client
+        return
+    from main import app
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                              timeout=60) as client:
+        yield client
+
+
+def print_report(report: dict) -> None:
+    """Print benchmark report as indented JSON"""
+    print(json.dumps(report, indent=2))
+
+
+@asynccontextmanager
+async def bench_session() -> AsyncIterator[AsyncSession]:
+    """Return a session to seed or delete benchmark data. It's not limited
+    by the statement timeout, which big tables may take longer than"""
+    async with async_session_maker() as session:
+        await session.execute(text("SET LOCAL statement_timeout = 0"))
+        yield session
+
+
+async def insert_bench_user(session: AsyncSession, username: str) -> int:
+    """Insert a benchmark USER without a password if it doesn't exist
+    and return its ID"""
+    await session.execute(text(
+        "INSERT INTO \"user\" (username, password, role, is_active) "
+        "VALUES (:username, '', 'USER_ROLE', true) ON CONFLICT (username) DO NOTHING"
+    ), {"username": username})
+    return (await session.execute(text("SELECT id FROM \"user\" WHERE username = :username"),
+                                  {"username": username})).scalar()
+
+
+async def analyze(session: AsyncSession, *tables: str) -> None:
+    """Collect statistics of seeded tables, call it before the commit of the
+    seeding transaction: they are saved with it, and queries right after
+    the seeding are planned with them"""
+    for table in tables:
+        await session.execute(text(f"ANALYZE {table}"))
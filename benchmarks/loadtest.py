@@ -0,0 +1,201 @@
+"""Load test of the API with a realistic mix of requests.
+
+Runs the FastAPI app in process (or against a running server with --url).
+Concurrent clients, each logged in as its own benchmark user, send
+weighted random requests: logins, lists and details of advertisements,
+comment CRUD and /users/me. Throughput and p50/p95/p99 latency of every
+endpoint are printed as JSON.
+
+Save a report with --output and pass it as --baseline on another commit
+to compare: the exit code is 1 if any endpoint is slower (p95 or p99) or
+has lower throughput than the baseline by more than --tolerance.
+
+Usage:
+    python -m benchmarks.loadtest --seconds 30 --clients 20 --output before.json
+    python -m benchmarks.loadtest --seconds 30 --clients 20 --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+import httpx
+from benchmarks.common import make_client, print_report, summarize
+
+BENCH_PASSWORD = "bench_password"
+# Relative frequency of every kind of request
+WEIGHTS = {
+    "POST /auth/login": 1,
+    "GET /adv/": 30,
+    "GET /adv/{adv_id}": 30,
+    "GET /adv/{adv_id}/comments": 15,
+    "POST /adv/{adv_id}/comments": 6,
+    "PUT /adv/{adv_id}/comments/{comment_id}": 3,
+    "DELETE /adv/{adv_id}/comments/{comment_id}": 3,
+    "GET /users/me": 12,
+}
+# Metrics compared with a baseline: a bigger value is a regression for
+# latencies and a smaller one for throughput
+COMPARED_LATENCIES = ("p95_ms", "p99_ms")
+
+
+class BenchClient:
+    """Benchmark user sending requests and keeping its own comments"""
+    def __init__(self, client: httpx.AsyncClient, username: str, rng: random.Random):
+        self.client = client
+        self.username = username
+        self.rng = rng
+        self.headers = {}
+        self.adv_ids: list[int] = []
+        self.comments: list[tuple[int, int]] = []
+
+    async def login(self) -> httpx.Response:
+        response = await self.client.post("/auth/login",
+                                          data={"username": self.username, "password": BENCH_PASSWORD})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def setup(self, advs: int) -> None:
+        """Register the user and create its advertisements"""
+        await self.client.post("/auth/register",
+                               json={"username": self.username, "password": BENCH_PASSWORD})
+        (await self.login()).raise_for_status()
+        for number in range(advs):
+            response = await self.client.post("/adv/", headers=self.headers,
+                                              json={"title": f"bench {number}",
+                                                    "body": "load test advertisement"})
+            response.raise_for_status()
+            self.adv_ids.append(response.json()["id"])
+
+    async def teardown(self) -> None:
+        await self.client.delete("/users/me", headers=self.headers)
+
+    async def request(self, endpoint: str, adv_ids: list[int]) -> httpx.Response:
+        """Send a request to the endpoint with random path parameters"""
+        adv_id = self.rng.choice(adv_ids)
+        if endpoint == "POST /auth/login":
+            return await self.login()
+        if endpoint == "GET /adv/":
+            return await self.client.get("/adv/")
+        if endpoint == "GET /adv/{adv_id}":
+            return await self.client.get(f"/adv/{adv_id}")
+        if endpoint == "GET /adv/{adv_id}/comments":
+            return await self.client.get(f"/adv/{adv_id}/comments")
+        if endpoint == "GET /users/me":
+            return await self.client.get("/users/me", headers=self.headers)
+        if endpoint == "POST /adv/{adv_id}/comments" or not self.comments:
+            response = await self.client.post(f"/adv/{adv_id}/comments", headers=self.headers,
+                                              json={"body": "load test comment"})
+            if response.status_code == 201:
+                self.comments.append((adv_id, response.json()["id"]))
+            return response
+        comment_adv_id, comment_id = self.rng.choice(self.comments)
+        url = f"/adv/{comment_adv_id}/comments/{comment_id}"
+        if endpoint.startswith("PUT"):
+            return await self.client.put(url, headers=self.headers, json={"body": "changed comment"})
+        self.comments.remove((comment_adv_id, comment_id))
+        return await self.client.delete(url, headers=self.headers)
+
+
+async def client_loop(bench_client: BenchClient, adv_ids: list[int], deadline: float,
+                      latencies: dict, errors: dict) -> None:
+    endpoints, weights = list(WEIGHTS), list(WEIGHTS.values())
+    while time.perf_counter() < deadline:
+        endpoint = bench_client.rng.choices(endpoints, weights)[0]
+        if endpoint.startswith(("PUT", "DELETE")) and not bench_client.comments:
+            endpoint = "POST /adv/{adv_id}/comments"
+        start = time.perf_counter()
+        response = await bench_client.request(endpoint, adv_ids)
+        latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            errors[endpoint] += 1
+
+
+async def run_load(clients: list[BenchClient], adv_ids: list[int], seconds: float) -> dict:
+    """Run all clients for 'seconds' and return stats of every endpoint"""
+    latencies, errors = defaultdict(list), defaultdict(int)
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(bench_client, adv_ids, start + seconds, latencies, errors)
+                           for bench_client in clients))
+    elapsed = time.perf_counter() - start
+    endpoints = {}
+    for endpoint in WEIGHTS:
+        endpoints[endpoint] = {**summarize(latencies[endpoint]),
+                               "throughput_rps": round(len(latencies[endpoint]) / elapsed, 2),
+                               "errors": errors[endpoint]}
+    total = [latency for endpoint_latencies in latencies.values() for latency in endpoint_latencies]
+    return {"total": {**summarize(total),
+                      "throughput_rps": round(len(total) / elapsed, 2),
+                      "errors": sum(errors.values())},
+            "endpoints": endpoints}
+
+
+def compare(report: dict, baseline: dict, tolerance: float, min_count: int) -> list[str]:
+    """Return descriptions of endpoints which have regressed against the baseline.
+    Endpoints with less than 'min_count' requests in any run are skipped
+    since their percentiles are too noisy"""
+    regressions = []
+    for endpoint, stats in report["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(endpoint)
+        if not base or min(base["count"], stats["count"]) < min_count:
+            continue
+        for metric in COMPARED_LATENCIES:
+            if stats[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{endpoint}: {metric} {base[metric]} -> {stats[metric]}")
+        if stats["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: throughput_rps "
+                               f"{base['throughput_rps']} -> {stats['throughput_rps']}")
+    return regressions
+
+
+async def main(url: str | None, seconds: float, clients_number: int, advs: int, seed: int,
+               output: str | None, baseline: str | None, tolerance: float, min_count: int) -> int:
+    rng = random.Random(seed)
+    async with make_client(url) as client:
+        run_id = uuid.uuid4().hex[:6]
+        clients = [BenchClient(client, f"bench_{run_id}_{number}", random.Random(rng.random()))
+                   for number in range(clients_number)]
+        for bench_client in clients:
+            await bench_client.setup(advs)
+        adv_ids = [adv_id for bench_client in clients for adv_id in bench_client.adv_ids]
+        try:
+            await run_load(clients, adv_ids, min(seconds, 2))  # warm up connections and caches
+            report = {"seconds": seconds, "clients": clients_number, "seed": seed,
+                      **await run_load(clients, adv_ids, seconds)}
+        finally:
+            for bench_client in clients:
+                await bench_client.teardown()
+    exit_code = 0
+    if baseline:
+        with open(baseline) as file:
+            regressions = compare(report, json.load(file), tolerance, min_count)
+        report["baseline"] = {"file": baseline, "tolerance": tolerance, "regressions": regressions}
+        exit_code = 1 if regressions else 0
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+    print_report(report)
+    return exit_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL of a running server, the app is run in process if not set")
+    parser.add_argument("--seconds", type=float, default=20, help="duration of the measured run")
+    parser.add_argument("--clients", type=int, default=10, help="number of concurrent users")
+    parser.add_argument("--advs", type=int, default=5, help="advertisements created by every user")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random request mix")
+    parser.add_argument("--output", help="file to save the JSON report to")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative regression against the baseline")
+    parser.add_argument("--min-count", type=int, default=50,
+                        help="min number of requests to an endpoint to compare it")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.url, args.seconds, args.clients, args.advs, args.seed,
+                              args.output, args.baseline, args.tolerance, args.min_count)))
@@ -0,0 +1,77 @@
+"""Load test of /adv/ latency during a burst of logins.
+
+Runs the FastAPI app in process (or against a running server with --url)
+and measures /adv/ latency twice: alone and while concurrent clients
+are logging in. With bcrypt running in the worker pool p99 of /adv/
+must stay close in both phases.
+
+Usage:
+    python -m benchmarks.login_burst --seconds 10 --readers 10 --logins 20
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from benchmarks.common import make_client, print_report, summarize
+
+BENCH_USERNAME = "bench_login"
+BENCH_PASSWORD = "bench_password"
+
+
+async def read_loop(client: httpx.AsyncClient, deadline: float, latencies: list) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/adv/")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def login_loop(client: httpx.AsyncClient, deadline: float, latencies: list) -> None:
+    credentials = {"username": BENCH_USERNAME, "password": BENCH_PASSWORD}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post("/auth/login", data=credentials)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_phase(client: httpx.AsyncClient, seconds: float,
+                    readers: int, logins: int) -> dict:
+    """Run reading clients and optionally login clients for 'seconds'"""
+    read_latencies, login_latencies = [], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(
+        *(read_loop(client, deadline, read_latencies) for _ in range(readers)),
+        *(login_loop(client, deadline, login_latencies) for _ in range(logins)),
+    )
+    phase = {"adv_list": summarize(read_latencies)}
+    if logins:
+        phase["login"] = summarize(login_latencies)
+    return phase
+
+
+async def main(url: str | None, seconds: float, readers: int, logins: int) -> None:
+    async with make_client(url) as client:
+        await client.post("/auth/register",
+                          json={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+        await run_phase(client, 1, readers, 0)  # warm up connections
+        report = {
+            "seconds": seconds, "readers": readers, "logins": logins,
+            "idle": await run_phase(client, seconds, readers, 0),
+            "login_burst": await run_phase(client, seconds, readers, logins),
+        }
+    idle_p99 = report["idle"]["adv_list"]["p99_ms"]
+    burst_p99 = report["login_burst"]["adv_list"]["p99_ms"]
+    report["adv_list_p99_ratio"] = round(burst_p99 / idle_p99, 2) if idle_p99 else None
+    print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server, app in process if omitted")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of every phase")
+    parser.add_argument("--readers", type=int, default=10, help="concurrent /adv/ clients")
+    parser.add_argument("--logins", type=int, default=20, help="concurrent /auth/login clients")
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.seconds, args.readers, args.logins))
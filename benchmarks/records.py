@@ -0,0 +1,100 @@
+"""Benchmark of reading rows as ORM instances and as read-only records.
+
+Seeds the benchmark user of benchmarks.repositories with --size
+advertisements and --size comments on one of them and reads them all by:
+
+- orm: read_all of the repositories building mapped Adv/Comment instances
+  which are kept by the identity map of the session
+- records: read_records selecting only viewed columns into slotted
+  dataclasses, without ORM state
+
+Throughput is the best of --repeats reads. Memory is measured by
+tracemalloc in a separate read: retained bytes per row while the result
+and its session are alive, and peak bytes per row during the read.
+
+Usage:
+    python -m benchmarks.records --size 100000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.adv.repository import AdvRepository
+from app.comments.repository import CommentRepository
+from app.database import async_session_maker
+from benchmarks.common import print_report
+from benchmarks.repositories import cleanup, seed
+
+Read = Callable[[AsyncSession], Awaitable[Any]]
+
+
+async def throughput(read: Read, rows: int, repeats: int) -> float:
+    """Return rows read per second by the best of the repeats"""
+    best = float("inf")
+    for _ in range(repeats):
+        async with async_session_maker() as session:
+            start = time.perf_counter()
+            await read(session)
+            best = min(best, time.perf_counter() - start)
+    return round(rows / best)
+
+
+async def memory(read: Read, rows: int) -> dict:
+    """Return retained and peak bytes allocated per row by a read"""
+    async with async_session_maker() as session:
+        await read(session)  # warm up connections and statement caches
+    # A new session, since the identity map would reuse instances of the first read
+    async with async_session_maker() as session:
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            result = await read(session)
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert len(result) == rows, "Not all rows are read"
+    return {"retained_bytes_per_row": round((retained - before) / rows),
+            "peak_bytes_per_row": round((peak - before) / rows)}
+
+
+async def measure(reads: dict[str, Read], rows: int, repeats: int) -> dict:
+    results = {}
+    for name, read in reads.items():
+        results[name] = {"rows_per_second": await throughput(read, rows, repeats),
+                         **await memory(read, rows)}
+    results["records_vs_orm"] = {
+        "throughput": round(results["records"]["rows_per_second"] / results["orm"]["rows_per_second"], 2),
+        "retained_memory": round(results["records"]["retained_bytes_per_row"]
+                                 / results["orm"]["retained_bytes_per_row"], 2),
+    }
+    return results
+
+
+async def main(size: int, repeats: int) -> None:
+    await cleanup()
+    fixture = await seed(size)
+    try:
+        user_id, adv_id = fixture.user.id, fixture.commented_adv_id
+        report = {"size": size, "repeats": repeats}
+        report["advertisements"] = await measure({
+            "orm": lambda session: AdvRepository(session).read_all(limit=size, author_id=user_id),
+            "records": lambda session: AdvRepository(session).read_records(limit=size, author_id=user_id),
+        }, size, repeats)
+        report["comments"] = await measure({
+            "orm": lambda session: CommentRepository(session).read_all(adv_id),
+            "records": lambda session: CommentRepository(session).read_records(adv_id),
+        }, size, repeats)
+    finally:
+        await cleanup()
+    print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000, help="number of advertisements and comments")
+    parser.add_argument("--repeats", type=int, default=5, help="reads for throughput, the best one is reported")
+    args = parser.parse_args()
+    asyncio.run(main(args.size, args.repeats))
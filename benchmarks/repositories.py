@@ -0,0 +1,251 @@
+"""Micro-benchmarks of repositories of advertisements, comments and users.
+
+For every data size a benchmark user is seeded with that many
+advertisements and that many comments on one of them, in addition to
+whatever the database already has (e.g. data of benchmarks.seed), and
+users without data are seeded to be deleted one per call. Every case
+calls a single repository method in a new session, --repeats times, and
+records its median and p95 time, number of SQL statements and peak
+memory allocated by Python during the call (measured by tracemalloc in
+a separate call, since tracing slows everything down).
+
+Save a report with --output and pass it as --baseline on another commit
+to compare: the exit code is 1 if any case makes more statements, or is
+slower or allocates more memory than the baseline by more than --tolerance.
+
+benchmarks/baselines/repositories.json is the report of the default run
+on the current tree, regenerate it with every change of repositories.
+Times and memory depend on the machine and the data, so compare them
+with a baseline made on the same one, statements don't depend on it.
+
+Usage:
+    python -m benchmarks.repositories --sizes 100 1000 10000 --output before.json
+    python -m benchmarks.repositories --sizes 100 1000 10000 --baseline before.json
+    python -m benchmarks.repositories --output benchmarks/baselines/repositories.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.adv.models import Group
+from app.adv.repository import AdvRepository
+from app.adv.schemas import AdvUpdate
+from app.comments.repository import CommentRepository
+from app.comments.schemas import CommentCreate
+from app.database import async_session_maker, engine
+from app.monitoring.queries import count_statements
+from app.users.repository import UserRepository
+from app.users.schemas import UserPrincipal, UserUpdate
+from benchmarks.common import analyze, bench_session, insert_bench_user, percentile, print_report
+
+BENCH_USERNAME = "bench_repositories"
+# Prefix of usernames of users without data seeded to be deleted, one per call
+SPARE_USERNAME_PREFIX = "bench_repo_spare_"
+# Group of seeded advertisements, comments on them are deleted by delete_group
+BENCH_GROUP = Group.SERVICE_ADV
+# Metrics compared with a baseline with the tolerance, statements are compared exactly
+COMPARED_METRICS = ("p50_ms", "peak_kib")
+
+
+class Fixture:
+    """IDs of seeded data of one size, cases take rows to change from them"""
+    def __init__(self, user: UserPrincipal, adv_ids: list[int], comment_ids: list[int],
+                 spare_user_ids: list[int] | None = None):
+        self.user = user
+        self.adv_ids = adv_ids
+        self.comment_ids = comment_ids
+        self.spare_user_ids = spare_user_ids or []
+        # The first Adv has all comments, the others are changed and deleted
+        self.commented_adv_id = adv_ids[0]
+        self.spare_adv_ids = adv_ids[1:]
+
+
+async def seed(size: int, spare_users: int = 0) -> Fixture:
+    """Insert the benchmark user with 'size' advertisements and 'size'
+    comments on the first one, and 'spare_users' users without data"""
+    async with bench_session() as session:
+        user_id = await insert_bench_user(session, BENCH_USERNAME)
+        adv_ids = (await session.execute(text("""
+            INSERT INTO advertisement (title, body, author_id, "group", is_active)
+            SELECT 'bench ' || g, 'benchmark advertisement ' || g, :author_id, :group, true
+            FROM generate_series(1, :size) AS g
+            RETURNING id
+        """), {"author_id": user_id, "group": BENCH_GROUP.name, "size": size})).scalars().all()
+        comment_ids = (await session.execute(text("""
+            INSERT INTO comment (body, author_id, adv_id)
+            SELECT 'benchmark comment ' || g, :author_id, :adv_id
+            FROM generate_series(1, :size) AS g
+            RETURNING id
+        """), {"author_id": user_id, "adv_id": min(adv_ids), "size": size})).scalars().all()
+        spare_user_ids = (await session.execute(text("""
+            INSERT INTO "user" (username, password, role, is_active)
+            SELECT :prefix || g::text, '', 'USER_ROLE', true
+            FROM generate_series(1, :spare_users) AS g
+            RETURNING id
+        """), {"prefix": SPARE_USERNAME_PREFIX, "spare_users": spare_users})).scalars().all()
+        await analyze(session, "advertisement", "comment")
+        await session.commit()
+        principal = await UserRepository(session).read_principal(BENCH_USERNAME)
+    return Fixture(principal, sorted(adv_ids), sorted(comment_ids), sorted(spare_user_ids))
+
+
+async def cleanup() -> None:
+    """Delete the benchmark users with all their data"""
+    async with bench_session() as session:
+        await session.execute(text("DELETE FROM \"user\" WHERE username = :username "
+                                   "OR starts_with(username, :prefix)"),
+                              {"username": BENCH_USERNAME, "prefix": SPARE_USERNAME_PREFIX})
+        await session.commit()
+
+
+def make_cases(fixture: Fixture, repeats: int) -> dict[str, Callable[[AsyncSession, int], Awaitable[Any]]]:
+    """Return cases by name, each one calls a repository method with the
+    session for the call number. Destructive cases take a distinct row
+    for every call, one more call is made with tracemalloc"""
+    user, adv_id = fixture.user, fixture.commented_adv_id
+    spare_advs, comments, spare_users = fixture.spare_adv_ids, fixture.comment_ids, fixture.spare_user_ids
+    cases = {
+        "AdvRepository.read": lambda session, number: AdvRepository(session).read(adv_id),
+        "AdvRepository.read_all": lambda session, number: AdvRepository(session).read_all(
+            limit=len(fixture.adv_ids), author_id=user.id),
+        "AdvRepository.read_records": lambda session, number: AdvRepository(session).read_records(
+            limit=len(fixture.adv_ids), author_id=user.id),
+        "AdvRepository.update": lambda session, number: AdvRepository(session).update(
+            AdvUpdate(body=f"updated {number}"), spare_advs[number % len(spare_advs)], user.id),
+        "CommentRepository.read": lambda session, number: CommentRepository(session).read(comments[0]),
+        "CommentRepository.read_all": lambda session, number: CommentRepository(session).read_all(adv_id),
+        "CommentRepository.read_records": lambda session, number: CommentRepository(session).read_records(
+            adv_id),
+        "CommentRepository.update": lambda session, number: CommentRepository(session).update(
+            CommentCreate(body=f"updated {number}"), comments[number % len(comments)], adv_id, user.id),
+        "UserRepository.read": lambda session, number: UserRepository(session).read(
+            user.username, with_advertisements=True),
+        "UserRepository.read_all": lambda session, number: UserRepository(session).read_all(),
+        "UserRepository.update": lambda session, number: UserRepository(session).update(
+            UserUpdate(fullname=f"Bench {number}"), user),
+    }
+    # Deleted rows are taken from the end, rows from the start are read and changed
+    if len(comments) > repeats + 1:
+        cases["CommentRepository.delete"] = lambda session, number: CommentRepository(session).delete(
+            comments[-1 - number], adv_id, user.id)
+    if len(spare_advs) > repeats + 1:
+        cases["AdvRepository.delete"] = lambda session, number: AdvRepository(session).delete(
+            spare_advs[-1 - number], user.id)
+    if len(spare_users) > repeats + 1:
+        cases["UserRepository.delete"] = lambda session, number: UserRepository(session).delete(
+            spare_users[number])
+    return cases
+
+
+async def call(case: Callable[[AsyncSession, int], Awaitable[Any]], number: int,
+               counter: list[int]) -> tuple[float, int]:
+    """Call the case in a new session and return its time in milliseconds
+    and number of SQL statements"""
+    async with async_session_maker() as session:
+        counter[0] = 0
+        start = time.perf_counter()
+        await case(session, number)
+        return (time.perf_counter() - start) * 1000, counter[0]
+
+
+async def measure(case: Callable[[AsyncSession, int], Awaitable[Any]], repeats: int,
+                  counter: list[int]) -> dict:
+    """Call the case 'repeats' times and once more with tracemalloc"""
+    timings, statements = [], 0
+    for number in range(repeats):
+        elapsed, statements = await call(case, number, counter)
+        timings.append(elapsed)
+    tracemalloc.start()
+    try:
+        await call(case, repeats, counter)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "calls": repeats,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "statements": statements,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+async def measure_delete_group(fixture: Fixture, counter: list[int]) -> dict:
+    """Delete all comments of the fixture by delete_group, it's called
+    once since nothing is left to delete after it"""
+    start_id, end_id = fixture.comment_ids[0], fixture.comment_ids[-1] + 1
+    tracemalloc.start()
+    try:
+        elapsed, statements = await call(
+            lambda session, number: CommentRepository(session).delete_group(BENCH_GROUP, start_id, end_id),
+            0, counter)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"calls": 1, "p50_ms": round(elapsed, 3), "p95_ms": round(elapsed, 3),
+            "statements": statements, "peak_kib": round(peak / 1024, 1)}
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return descriptions of cases which have regressed against the baseline"""
+    regressions = []
+    for size, cases in report["sizes"].items():
+        for name, stats in cases.items():
+            base = baseline.get("sizes", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            if stats["statements"] > base["statements"]:
+                regressions.append(f"{name} at {size}: statements {base['statements']} -> {stats['statements']}")
+            for metric in COMPARED_METRICS:
+                if stats[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(f"{name} at {size}: {metric} {base[metric]} -> {stats[metric]}")
+    return regressions
+
+
+async def main(sizes: list[int], repeats: int, output: str | None,
+               baseline: str | None, tolerance: float) -> int:
+    report = {"repeats": repeats, "sizes": {}}
+    with count_statements(engine) as counter:
+        for size in sizes:
+            await cleanup()
+            # A spare user is deleted by every call of UserRepository.delete and its warm-up
+            fixture = await seed(size, spare_users=repeats + 2)
+            try:
+                results = {}
+                for name, case in make_cases(fixture, repeats).items():
+                    await call(case, repeats + 1, counter)  # warm up statement caches
+                    results[name] = await measure(case, repeats, counter)
+                results["CommentRepository.delete_group"] = await measure_delete_group(fixture, counter)
+                report["sizes"][str(size)] = results
+            finally:
+                await cleanup()
+    exit_code = 0
+    if baseline:
+        with open(baseline) as file:
+            regressions = compare(report, json.load(file), tolerance)
+        report["baseline"] = {"file": baseline, "tolerance": tolerance, "regressions": regressions}
+        exit_code = 1 if regressions else 0
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+    print_report(report)
+    return exit_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="numbers of advertisements and comments of the benchmark user")
+    parser.add_argument("--repeats", type=int, default=20, help="calls of every case")
+    parser.add_argument("--output", help="file to save the JSON report to")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative regression of time and memory against the baseline")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.sizes, args.repeats, args.output, args.baseline, args.tolerance)))
@@ -0,0 +1,98 @@
+"""Benchmark of full-text search over advertisements.
+
+Seeds a table of advertisements built from a skewed vocabulary (so there
+are both frequent and rare words), then measures latency of the first and
+the following pages of AdvRepository.search.
+
+Usage:
+    python -m benchmarks.search --rows 1000000 --runs 50
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import text
+from app.adv.repository import AdvRepository
+from app.database import async_session_maker
+from benchmarks.common import analyze, bench_session, insert_bench_user, print_report, summarize
+
+# Benchmark author of seeded advertisements, deleted with them at the end
+BENCH_USERNAME = "bench_search"
+VOCABULARY = [f"word{i}" for i in range(5000)]
+# Words from the head, the middle and the tail of the skewed vocabulary
+QUERIES = ["word0", "word1 word2", "word50", "word500 -word0", "word4000"]
+
+
+async def seed(rows: int) -> None:
+    """Insert 'rows' advertisements of the benchmark user"""
+    async with bench_session() as session:
+        author_id = await insert_bench_user(session, BENCH_USERNAME)
+        # power() skews the choice of words to the beginning of the vocabulary
+        await session.execute(text("""
+            INSERT INTO advertisement (title, body, author_id, "group", is_active)
+            SELECT
+                array_to_string(ARRAY(
+                    SELECT (CAST(:words AS text[]))[1 + floor(power(random(), 3) * :size)::int]
+                    FROM generate_series(1, 3) WHERE g > 0), ' '),
+                array_to_string(ARRAY(
+                    SELECT (CAST(:words AS text[]))[1 + floor(power(random(), 3) * :size)::int]
+                    FROM generate_series(1, 40) WHERE g > 0), ' '),
+                :author_id, 'SELLING_ADV', true
+            FROM generate_series(1, :rows) AS g
+        """), {"words": VOCABULARY, "size": len(VOCABULARY),
+               "author_id": author_id, "rows": rows})
+        await analyze(session, "advertisement")
+        await session.commit()
+
+
+async def cleanup() -> None:
+    """Delete the benchmark user with all seeded advertisements"""
+    async with bench_session() as session:
+        await session.execute(text("DELETE FROM \"user\" WHERE username = :username"),
+                              {"username": BENCH_USERNAME})
+        await session.commit()
+
+
+async def measure(query: str, runs: int, limit: int) -> dict:
+    """Measure latency of the first and the tenth page of search results"""
+    first_page, tenth_page = [], []
+    async with async_session_maker() as session:
+        repo = AdvRepository(session)
+        for _ in range(runs):
+            start = time.perf_counter()
+            rows = await repo.search(query, limit + 1)
+            first_page.append((time.perf_counter() - start) * 1000)
+            after = None
+            for _ in range(9):
+                if len(rows) <= limit:
+                    break
+                after = (rows[limit - 1].rank, rows[limit - 1].id)
+                start = time.perf_counter()
+                rows = await repo.search(query, limit + 1, after)
+            if after is not None:
+                tenth_page.append((time.perf_counter() - start) * 1000)
+    return {"first_page": summarize(first_page), "tenth_page": summarize(tenth_page)}
+
+
+async def main(rows: int, runs: int, limit: int, keep: bool) -> None:
+    start = time.perf_counter()
+    await seed(rows)
+    report = {"rows": rows, "runs": runs, "limit": limit,
+              "seed_seconds": round(time.perf_counter() - start, 1), "queries": {}}
+    try:
+        for query in QUERIES:
+            report["queries"][query] = await measure(query, runs, limit)
+    finally:
+        if not keep:
+            await cleanup()
+    print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="number of seeded advertisements")
+    parser.add_argument("--runs", type=int, default=20, help="runs of every query")
+    parser.add_argument("--limit", type=int, default=20, help="page size")
+    parser.add_argument("--keep", action="store_true", help="don't delete seeded data")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.runs, args.limit, args.keep))
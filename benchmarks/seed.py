@@ -0,0 +1,147 @@
+"""Generator of a big synthetic dataset of users, advertisements and comments.
+
+Rows are generated by a seeded random generator, so the same arguments
+give the same data, and bulk-loaded with Postgres COPY through asyncpg.
+Distributions are skewed like in a real board: few authors write most
+advertisements and few advertisements get most comments.
+
+Passwords of users are valid bcrypt hashes drawn from a small pool
+computed once with deterministic salts: user number N has password
+'seed-password-{N % pool}', so benchmarks can log in as any of them.
+
+IDs continue the existing ones and sequences are moved past them, use
+--truncate to load into empty tables (then IDs start from 1).
+
+Usage:
+    python -m benchmarks.seed --users 100000 --advs 1000000 --comments 10000000 --truncate
+"""
+import argparse
+import asyncio
+import random
+import time
+import asyncpg
+from passlib.hash import bcrypt
+from app.config import settings
+from app.users.passwords import pwd_context
+from benchmarks.common import print_report
+
+# Alphabet of bcrypt salts, the last of 22 salt characters keeps only 2 bits
+BCRYPT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+BCRYPT_LAST_SALT_CHARS = ".Oeu"
+VOCABULARY = [f"word{i}" for i in range(5000)]
+# Stored names of Roles and Group enums with their shares of rows
+ROLES = {"USER_ROLE": 98, "MODERATOR_ROLE": 1.5, "ADMIN_ROLE": 0.5}
+GROUPS = {"SELLING_ADV": 60, "BUYING_ADV": 30, "SERVICE_ADV": 10}
+# Exponent skewing random numbers to 0: the bigger it is the more rows
+# belong to the first authors and advertisements
+SKEW = 3
+
+
+def password_pool(size: int, rng: random.Random) -> list[str]:
+    """Return bcrypt hashes of 'seed-password-{N}' passwords with salts from rng"""
+    rounds = pwd_context.handler().default_rounds
+    hashes = []
+    for number in range(size):
+        salt = "".join(rng.choice(BCRYPT_ALPHABET) for _ in range(21)) + rng.choice(BCRYPT_LAST_SALT_CHARS)
+        hashes.append(bcrypt.using(salt=salt, rounds=rounds).hash(f"seed-password-{number}"))
+    return hashes
+
+
+def skewed(rng: random.Random, size: int) -> int:
+    """Return a random number in range 0..size-1 skewed to 0"""
+    return int(size * rng.random() ** SKEW)
+
+
+def text_of(rng: random.Random, words: int) -> str:
+    return " ".join(VOCABULARY[skewed(rng, len(VOCABULARY))] for _ in range(words))
+
+
+def generate_users(rng: random.Random, count: int, first_id: int, hashes: list[str]):
+    roles, role_weights = list(ROLES), list(ROLES.values())
+    for number in range(count):
+        user_id = first_id + number
+        has_profile = rng.random() < 0.7
+        yield (user_id, f"seed_{user_id}", hashes[number % len(hashes)],
+               f"Seed User {user_id}" if has_profile else None,
+               f"seed_{user_id}@example.com" if has_profile else None,
+               rng.choices(roles, role_weights)[0], rng.random() < 0.98, 0)
+
+
+def generate_advs(rng: random.Random, count: int, first_id: int, first_user_id: int, users: int):
+    groups, group_weights = list(GROUPS), list(GROUPS.values())
+    for number in range(count):
+        yield (first_id + number, text_of(rng, rng.randint(1, 5))[:50],
+               text_of(rng, rng.randint(10, 60)), first_user_id + skewed(rng, users),
+               rng.choices(groups, group_weights)[0], rng.random() < 0.9)
+
+
+def generate_comments(rng: random.Random, count: int, first_id: int,
+                      first_user_id: int, users: int, first_adv_id: int, advs: int):
+    # Texts are drawn from a pool, building millions of them is the slowest part
+    bodies = [text_of(rng, rng.randint(3, 30))[:500] for _ in range(10000)]
+    for number in range(count):
+        yield (first_id + number, rng.choice(bodies),
+               first_user_id + int(users * rng.random()), first_adv_id + skewed(rng, advs))
+
+
+async def next_id(connection: asyncpg.Connection, table: str) -> int:
+    return await connection.fetchval(f'SELECT coalesce(max(id), 0) + 1 FROM "{table}"')
+
+
+async def copy(connection: asyncpg.Connection, table: str, columns: list[str], records) -> float:
+    """Load records to the table with COPY, move its ID sequence and return seconds spent"""
+    start = time.perf_counter()
+    await connection.copy_records_to_table(table, columns=columns, records=records)
+    await connection.execute(
+        f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), (SELECT max(id) FROM \"{table}\"))"
+    )
+    return round(time.perf_counter() - start, 1)
+
+
+async def main(users: int, advs: int, comments: int, seed: int, pool: int, truncate: bool) -> None:
+    rng = random.Random(seed)
+    report = {"users": users, "advs": advs, "comments": comments, "seed": seed, "seconds": {}}
+    start = time.perf_counter()
+    hashes = password_pool(pool, rng)
+    report["seconds"]["password_pool"] = round(time.perf_counter() - start, 1)
+    connection = await asyncpg.connect(host=settings.DB_HOST, port=settings.DB_PORT,
+                                       user=settings.DB_USER, password=settings.DB_PASS,
+                                       database=settings.DB_NAME)
+    try:
+        if truncate:
+            await connection.execute('TRUNCATE comment, advertisement, "user" RESTART IDENTITY')
+        first_user_id = await next_id(connection, "user")
+        first_adv_id = await next_id(connection, "advertisement")
+        first_comment_id = await next_id(connection, "comment")
+        report["seconds"]["user"] = await copy(
+            connection, "user",
+            ["id", "username", "password", "fullname", "email", "role", "is_active", "token_version"],
+            generate_users(rng, users, first_user_id, hashes))
+        report["seconds"]["advertisement"] = await copy(
+            connection, "advertisement", ["id", "title", "body", "author_id", "group", "is_active"],
+            generate_advs(rng, advs, first_adv_id, first_user_id, users))
+        report["seconds"]["comment"] = await copy(
+            connection, "comment", ["id", "body", "author_id", "adv_id"],
+            generate_comments(rng, comments, first_comment_id, first_user_id, users, first_adv_id, advs))
+        analyze_start = time.perf_counter()
+        await connection.execute('ANALYZE "user", advertisement, comment')
+        report["seconds"]["analyze"] = round(time.perf_counter() - analyze_start, 1)
+    finally:
+        await connection.close()
+    report["seconds"]["total"] = round(time.perf_counter() - start, 1)
+    report["first_ids"] = {"user": first_user_id, "advertisement": first_adv_id, "comment": first_comment_id}
+    print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000, help="number of users")
+    parser.add_argument("--advs", type=int, default=100_000, help="number of advertisements")
+    parser.add_argument("--comments", type=int, default=1_000_000, help="number of comments")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    parser.add_argument("--password-pool", type=int, default=16, help="number of distinct password hashes")
+    parser.add_argument("--truncate", action="store_true",
+                        help="delete ALL users, advertisements and comments before loading")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.advs, args.comments, args.seed, args.password_pool, args.truncate))
@@ -0,0 +1,114 @@
+"""Benchmark of JSON serialization of list responses.
+
+Compares two ways to encode ORM instances of list endpoints:
+
+- validated: the default FastAPI path, every object is validated against
+  response_model of the route and then dumped to JSON
+- precompiled: app.serialization.Serializer reading fields of trusted
+  objects by a precompiled getter and encoding them with pydantic_core
+
+Pages of advertisements and comments and the list of users with their
+advertisements are built in memory, no database is used. Both outputs
+are checked to decode to the same data.
+
+Usage:
+    python -m benchmarks.serialization --sizes 1000 10000 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable
+from fastapi import APIRouter
+from fastapi.routing import APIRoute, serialize_response
+from app import Adv, User
+from app.adv.models import Group
+from app.adv.router import adv_router
+from app.adv.schemas import adv_serializer
+from app.comments.models import Comment
+from app.comments.router import comment_router
+from app.comments.schemas import comment_serializer
+from app.pagination import build_page
+from app.users.models import Roles
+from app.users.router import user_router
+from app.users.schemas import user_full_info_serializer
+from benchmarks.common import print_report
+
+# Advertisements of every user in the list of users
+ADVS_PER_USER = 5
+
+
+def make_advs(size: int) -> list[Adv]:
+    groups = list(Group)
+    return [Adv(id=number, title=f"title {number}", body=f"body of advertisement {number}" * 4,
+                author_id=number % 100, group=groups[number % len(groups)], is_active=True)
+            for number in range(size)]
+
+
+def make_comments(size: int) -> list[Comment]:
+    return [Comment(id=number, body=f"comment {number}", author_id=number % 100, adv_id=1)
+            for number in range(size)]
+
+
+def make_users(size: int) -> list[User]:
+    users = []
+    for number in range(size):
+        advs = make_advs(ADVS_PER_USER)
+        users.append(User(id=number, username=f"user_{number}", password="",
+                          fullname=f"User {number}", email=f"user_{number}@example.com",
+                          role=Roles.USER_ROLE, is_active=True, advertisements=advs))
+    return users
+
+
+def find_route(router: APIRouter, path: str) -> APIRoute:
+    return next(route for route in router.routes
+                if isinstance(route, APIRoute) and route.path == path and "GET" in route.methods)
+
+
+def timed(function: Callable[[], Any]) -> tuple[float, Any]:
+    start = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def measure(route: APIRoute, content: Any, precompiled: Callable[[], bytes], repeats: int) -> dict:
+    """Return the best time of both paths in milliseconds"""
+    def validated() -> bytes:
+        return asyncio.run(serialize_response(field=route.response_field,
+                                              response_content=content, dump_json=True))
+    validated_ms, validated_body = min(timed(validated) for _ in range(repeats))
+    precompiled_ms, precompiled_body = min(timed(precompiled) for _ in range(repeats))
+    assert json.loads(validated_body) == json.loads(precompiled_body), "Serialized data differs"
+    return {"validated_ms": round(validated_ms, 2),
+            "precompiled_ms": round(precompiled_ms, 2),
+            "speedup": round(validated_ms / precompiled_ms, 1)}
+
+
+def main(sizes: list[int], repeats: int) -> None:
+    report = {"repeats": repeats, "sizes": {}}
+    for size in sizes:
+        adv_page = build_page(make_advs(size), size, lambda adv: (adv.id,))
+        comment_page = build_page(make_comments(size), size, lambda comment: (comment.id,))
+        users = make_users(size // ADVS_PER_USER)
+        report["sizes"][size] = {
+            "GET /adv/": measure(find_route(adv_router, "/adv/"), adv_page,
+                                 lambda: adv_serializer.page_response(adv_page).body, repeats),
+            "GET /adv/{adv_id}/comments": measure(
+                find_route(comment_router, "/{adv_id}/comments"), comment_page,
+                lambda: comment_serializer.page_response(comment_page).body, repeats),
+            f"GET /users/list ({ADVS_PER_USER} advertisements per user)": measure(
+                find_route(user_router, "/users/list"), users,
+                lambda: user_full_info_serializer.response(users).body, repeats),
+        }
+    print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="numbers of serialized advertisements and comments, the list of "
+                             f"users has a fifth of it with {ADVS_PER_USER} advertisements each")
+    parser.add_argument("--repeats", type=int, default=5, help="runs of every path, the best one is reported")
+    args = parser.parse_args()
+    main(args.sizes, args.repeats)
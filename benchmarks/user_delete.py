@@ -0,0 +1,142 @@
+"""Benchmark of deleting a user with a lot of advertisements and comments.
+
+Seeds a user owning many advertisements and comments, with half of the
+comments left on them by a neighbour user. It then deletes the user in
+two ways:
+
+- cascade: a single DELETE of the user row relying on ON DELETE CASCADE
+- batched: the background pipeline of app.users.service.delete_user_data
+
+The neighbour keeps commenting advertisements of the user meanwhile,
+latency of these writes shows how long other writers are blocked by
+locks of the deletion.
+
+Usage:
+    python -m benchmarks.user_delete --ads 100000 --comments 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import async_session_maker
+from app.jobs.schemas import Job
+from app.users.service import delete_user_data
+from benchmarks.common import analyze, bench_session, insert_bench_user, print_report, summarize
+
+# Benchmark users, the first one is deleted, the second one is deleted at the end
+BENCH_USERNAME = "bench_delete"
+NEIGHBOUR_USERNAME = "bench_delete_neighbour"
+
+
+async def seed(ads: int, comments: int) -> tuple[int, list[int]]:
+    """Insert users, advertisements and comments. Returns ID of the user
+    to delete and IDs of the user's advertisements"""
+    async with bench_session() as session:
+        user_id = await insert_bench_user(session, BENCH_USERNAME)
+        neighbour_id = await insert_bench_user(session, NEIGHBOUR_USERNAME)
+        await session.execute(text("""
+            INSERT INTO advertisement (title, body, author_id, "group", is_active)
+            SELECT 'bench ' || g, 'benchmark advertisement', :author_id, 'SELLING_ADV', true
+            FROM generate_series(1, :ads) AS g
+        """), {"author_id": user_id, "ads": ads})
+        # Comments are spread over the user's advertisements, every second
+        # one is written by the neighbour
+        await session.execute(text("""
+            INSERT INTO comment (body, author_id, adv_id)
+            SELECT 'benchmark comment',
+                   CASE WHEN g % 2 = 0 THEN :author_id ELSE :neighbour_id END,
+                   ads.ids[1 + g % array_length(ads.ids, 1)]
+            FROM generate_series(1, :comments) AS g,
+                 (SELECT array_agg(id) AS ids FROM advertisement WHERE author_id = :author_id) AS ads
+        """), {"author_id": user_id, "neighbour_id": neighbour_id, "comments": comments})
+        adv_ids = (await session.execute(text("SELECT id FROM advertisement WHERE author_id = :author_id"),
+                                         {"author_id": user_id})).scalars().all()
+        await analyze(session, "advertisement", "comment")
+        await session.commit()
+    return user_id, adv_ids
+
+
+async def cleanup() -> None:
+    """Delete the benchmark users with all their data"""
+    async with bench_session() as session:
+        await session.execute(text("DELETE FROM \"user\" WHERE username IN (:user, :neighbour)"),
+                              {"user": BENCH_USERNAME, "neighbour": NEIGHBOUR_USERNAME})
+        await session.commit()
+
+
+async def write_loop(adv_ids: list[int], done: asyncio.Event, latencies: list) -> None:
+    """Comment random advertisements of the user as the neighbour till the
+    deletion is done. Writes to already deleted advertisements fail, they
+    are measured as well"""
+    async with async_session_maker() as session:
+        author_id = (await session.execute(text("SELECT id FROM \"user\" WHERE username = :username"),
+                                           {"username": NEIGHBOUR_USERNAME})).scalar()
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                await session.execute(text(
+                    "INSERT INTO comment (body, author_id, adv_id) VALUES ('write', :author_id, :adv_id)"
+                ), {"author_id": author_id, "adv_id": random.choice(adv_ids)})
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.01)
+
+
+async def delete_cascade(user_id: int) -> None:
+    async with async_session_maker() as session:
+        await session.execute(text("DELETE FROM \"user\" WHERE id = :user_id"), {"user_id": user_id})
+        await session.commit()
+
+
+async def delete_batched(user_id: int) -> None:
+    job = Job(id="bench", name="benchmark", created_at=datetime.now(timezone.utc))
+    await delete_user_data(job, user_id)
+
+
+async def measure(mode: str, ads: int, comments: int) -> dict:
+    """Seed data and delete the user while the neighbour is writing"""
+    start = time.perf_counter()
+    user_id, adv_ids = await seed(ads, comments)
+    seed_seconds = time.perf_counter() - start
+    latencies = []
+    done = asyncio.Event()
+    writer = asyncio.create_task(write_loop(adv_ids, done, latencies))
+    await asyncio.sleep(0.2)
+    start = time.perf_counter()
+    try:
+        await (delete_cascade if mode == "cascade" else delete_batched)(user_id)
+        delete_seconds = time.perf_counter() - start
+    finally:
+        done.set()
+        await writer
+        await cleanup()
+    return {"seed_seconds": round(seed_seconds, 1),
+            "delete_seconds": round(delete_seconds, 2),
+            "neighbour_writes": {**summarize(latencies), "max_ms": round(max(latencies, default=0), 3)}}
+
+
+async def main(ads: int, comments: int, batch_size: int, modes: list[str]) -> None:
+    settings.DELETE_BATCH_SIZE = batch_size
+    report = {"ads": ads, "comments": comments, "batch_size": batch_size}
+    for mode in modes:
+        report[mode] = await measure(mode, ads, comments)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ads", type=int, default=100_000, help="number of advertisements of the user")
+    parser.add_argument("--comments", type=int, default=100_000, help="number of comments on them")
+    parser.add_argument("--batch-size", type=int, default=settings.DELETE_BATCH_SIZE,
+                        help="max number of rows deleted in one transaction")
+    parser.add_argument("--mode", choices=["cascade", "batched"], action="append",
+                        help="deletion to measure, both by default")
+    args = parser.parse_args()
+    asyncio.run(main(args.ads, args.comments, args.batch_size, args.mode or ["cascade", "batched"]))
@@ -1,7 +1,16 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 import uvicorn
 from fastapi import FastAPI
 from app.adv.router import adv_router
 from app.auth.router import auth_router
+from app.cache import invalidation_listener
+from app.config import settings
+from app.database import WriteMarkerMiddleware, replica_engines
+from app.jobs.router import job_router
+from app.jobs.service import watch_jobs
+from app.monitoring.metrics import MetricsMiddleware
+from app.monitoring.router import monitoring_router
 from app.users.router import user_router
 
 description = """
@@ -17,16 +26,39 @@ description = """
     **Auth**
     Service offers JWT tokens is used for authorization 
 """
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Listen to invalidations of the caches and resume abandoned
+    background jobs while the worker runs"""
+    tasks = [asyncio.create_task(invalidation_listener.listen()),
+             asyncio.create_task(watch_jobs())]
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Advertising service",
     description=description,
     summary="Advertising service is a simple API of an advertisement board",
     version="1.0"
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if replica_engines:
+    app.add_middleware(WriteMarkerMiddleware)
+
 app.include_router(auth_router, tags=["Authorization"])
 app.include_router(user_router, tags=["User"])
 app.include_router(adv_router, tags=["Advertisement and Comment"])
+app.include_router(job_router, tags=["Background job"])
+app.include_router(monitoring_router, tags=["Monitoring"])
 
 if __name__ == "__main__":
     uvicorn.run(app="main:app", reload=True, port=8001)
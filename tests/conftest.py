@@ -0,0 +1,97 @@
+import asyncio
+import os
+import subprocess
+import sys
+from contextlib import suppress
+import asyncpg
+import httpx
+import pytest
+from sqlalchemy import text
+from app.config import settings
+
+# Tests change and delete data, so they use their own database migrated
+# to the head revision. Replicas of the main database aren't used, and
+# responses are not cached to count statements of every request. The app
+# must be imported after it
+SERVER_DB_NAME = settings.DB_NAME
+settings.DB_NAME = os.environ.get("TEST_DB_NAME", f"{SERVER_DB_NAME}_test")
+settings.DB_REPLICA_URLS = []
+settings.RESPONSE_CACHE_BYTES = 0
+
+from app.cache import invalidation_listener  # noqa: E402
+from app.database import async_session_maker, engine  # noqa: E402
+from app.monitoring.queries import count_statements  # noqa: E402
+from main import app  # noqa: E402
+from tests.helpers import TEST_ADMIN_USERNAME, TEST_PASSWORD, TEST_USERNAME, delete_users, login  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    """Run all tests in one event loop, connections of the pool are bound to it"""
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def database(anyio_backend):
+    """Create the test database if it doesn't exist and apply migrations to
+    it, tests are skipped if the database server is unavailable"""
+    try:
+        connection = await asyncpg.connect(host=settings.DB_HOST, port=settings.DB_PORT,
+                                           user=settings.DB_USER, password=settings.DB_PASS,
+                                           database=SERVER_DB_NAME)
+    except OSError as e:
+        pytest.skip(f"Database is not available: {e!r}")
+    try:
+        if not await connection.fetchval("SELECT true FROM pg_database WHERE datname = $1",
+                                         settings.DB_NAME):
+            await connection.execute(f'CREATE DATABASE "{settings.DB_NAME}"')
+    finally:
+        await connection.close()
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"],
+                   env={**os.environ, "DB_NAME": settings.DB_NAME}, check=True)
+
+
+@pytest.fixture(scope="session")
+async def client(database):
+    """Client calling the app in process. The lifespan of the app is not
+    run, so only the listener of cache invalidations is started"""
+    listener = asyncio.create_task(invalidation_listener.listen())
+    while not invalidation_listener.listening:
+        await asyncio.sleep(0.01)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await listener
+
+
+@pytest.fixture(scope="session")
+def statements():
+    """Counter of SQL statements executed by the app, reset it before a request"""
+    with count_statements(engine) as counter:
+        yield counter
+
+
+@pytest.fixture(scope="session")
+async def tokens(client):
+    """Tokens of a USER and an ADMIN by their usernames"""
+    await delete_users(TEST_USERNAME, TEST_ADMIN_USERNAME)
+    for username in (TEST_USERNAME, TEST_ADMIN_USERNAME):
+        response = await client.post("/auth/register", json={"username": username, "password": TEST_PASSWORD})
+        assert response.status_code == 201, response.text
+    async with async_session_maker() as session:
+        await session.execute(text("UPDATE \"user\" SET role = 'ADMIN_ROLE' WHERE username = :username"),
+                              {"username": TEST_ADMIN_USERNAME})
+        await session.commit()
+    yield {username: await login(client, username) for username in (TEST_USERNAME, TEST_ADMIN_USERNAME)}
+    await delete_users(TEST_USERNAME, TEST_ADMIN_USERNAME)
+
+
+@pytest.fixture(scope="session")
+def user_headers(tokens):
+    return {"Authorization": f"Bearer {tokens[TEST_USERNAME]['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin_headers(tokens):
+    return {"Authorization": f"Bearer {tokens[TEST_ADMIN_USERNAME]['access_token']}"}
@@ -0,0 +1,23 @@
+import httpx
+from sqlalchemy import text
+from app.database import async_session_maker
+
+# Users created for the tests and deleted with all their data after them
+TEST_USERNAME = "test_statements"
+TEST_ADMIN_USERNAME = "test_statements_admin"
+TEST_PASSWORD = "test_password"
+
+
+async def delete_users(*usernames: str) -> None:
+    """Delete the users with all their data"""
+    async with async_session_maker() as session:
+        await session.execute(text("DELETE FROM \"user\" WHERE username = ANY(:usernames)"),
+                              {"usernames": list(usernames)})
+        await session.commit()
+
+
+async def login(client: httpx.AsyncClient, username: str) -> dict:
+    """Return tokens of the user with TEST_PASSWORD"""
+    response = await client.post("/auth/login", data={"username": username, "password": TEST_PASSWORD})
+    assert response.status_code == 200, response.text
+    return response.json()
@@ -0,0 +1,87 @@
+"""Invalidation rules of the response cache of advertisements, they
+don't need the database."""
+import time
+import pytest
+from app.adv import cache as adv_cache_module
+from app.adv.cache import AdvResponseCache, CachedResponse
+
+RESPONSE = CachedResponse(b'{"id": 1}', '"etag"')
+PAGE_KEY = AdvResponseCache.page_key(20, None, None, True)
+
+
+@pytest.fixture
+def cache() -> AdvResponseCache:
+    """Cache of a worker listening to invalidations, without replicas"""
+    cache = AdvResponseCache(1024 * 1024, 0)
+    cache.listening = True
+    return cache
+
+
+def test_change_beyond_bound_keeps_page(cache):
+    cache.set_page(PAGE_KEY, RESPONSE, 10, time.monotonic())
+    cache.invalidate([11])
+    assert cache.get(PAGE_KEY) == RESPONSE
+
+
+@pytest.mark.parametrize("adv_id", [10, 3])
+def test_change_at_or_below_bound_drops_page(cache, adv_id):
+    cache.set_page(PAGE_KEY, RESPONSE, 10, time.monotonic())
+    cache.invalidate([adv_id])
+    assert cache.get(PAGE_KEY) is None
+
+
+def test_change_drops_unbounded_page(cache):
+    cache.set_page(PAGE_KEY, RESPONSE, None, time.monotonic())
+    cache.invalidate([1_000_000])
+    assert cache.get(PAGE_KEY) is None
+
+
+def test_change_drops_adv(cache):
+    cache.set_adv(1, RESPONSE, time.monotonic())
+    cache.set_adv(2, RESPONSE, time.monotonic())
+    cache.invalidate([1])
+    assert cache.get(cache.adv_key(1)) is None
+    assert cache.get(cache.adv_key(2)) == RESPONSE
+
+
+def test_read_started_before_change_is_not_stored(cache):
+    started = time.monotonic()
+    cache.invalidate([5])
+    cache.set_adv(5, RESPONSE, started)
+    cache.set_page(PAGE_KEY, RESPONSE, 5, started)
+    assert cache.get(cache.adv_key(5)) is None
+    assert cache.get(PAGE_KEY) is None
+
+
+def test_read_started_before_unrelated_change_is_stored(cache):
+    started = time.monotonic()
+    cache.invalidate([5])
+    cache.set_adv(6, RESPONSE, started)
+    cache.set_page(PAGE_KEY, RESPONSE, 4, started)
+    assert cache.get(cache.adv_key(6)) == RESPONSE
+    assert cache.get(PAGE_KEY) == RESPONSE
+
+
+def test_read_started_after_change_is_stored(cache):
+    cache.invalidate([5])
+    cache.set_adv(5, RESPONSE, time.monotonic())
+    assert cache.get(cache.adv_key(5)) == RESPONSE
+
+
+def test_history_overflow_refuses_reads_started_before(cache, monkeypatch):
+    monkeypatch.setattr(adv_cache_module, "INVALIDATION_HISTORY_SIZE", 2)
+    started = time.monotonic()
+    cache.invalidate([1])
+    cache.invalidate([2])
+    # The first change is forgotten, so any read started before it may be stale
+    cache.invalidate([3])
+    cache.set_adv(99, RESPONSE, started)
+    assert cache.get(cache.adv_key(99)) is None
+    cache.set_adv(99, RESPONSE, time.monotonic())
+    assert cache.get(cache.adv_key(99)) == RESPONSE
+
+
+def test_nothing_is_served_while_not_listening(cache):
+    cache.set_adv(1, RESPONSE, time.monotonic())
+    cache.listening = False
+    assert cache.get(cache.adv_key(1)) is None
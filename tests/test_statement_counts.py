@@ -0,0 +1,234 @@
+"""Exact numbers of SQL statements executed by every endpoint.
+
+Relationships are never loaded implicitly, so a change of these numbers
+means a query has been added or an eager load has come back. The
+response cache is off in the tests.
+"""
+from typing import Awaitable
+import httpx
+import pytest
+from app.adv.models import Group
+from tests.helpers import TEST_ADMIN_USERNAME, TEST_PASSWORD, TEST_USERNAME, delete_users, login
+
+pytestmark = pytest.mark.anyio
+
+# User registered, changed and deleted by the tests of these endpoints
+THROWAWAY_USERNAME = "test_statements_new"
+
+
+async def counted(statements: list[int], request: Awaitable[httpx.Response]) -> tuple[httpx.Response, int]:
+    """Send the request and return its response and number of SQL statements"""
+    statements[0] = 0
+    response = await request
+    return response, statements[0]
+
+
+@pytest.fixture
+async def throwaway_username(client):
+    """Username of a user which doesn't exist, it's deleted after the test"""
+    await delete_users(THROWAWAY_USERNAME)
+    yield THROWAWAY_USERNAME
+    await delete_users(THROWAWAY_USERNAME)
+
+
+@pytest.fixture
+async def throwaway_user(client, throwaway_username):
+    """Username of a new registered USER"""
+    response = await client.post("/auth/register", json={"username": throwaway_username,
+                                                         "password": TEST_PASSWORD})
+    assert response.status_code == 201, response.text
+    return throwaway_username
+
+
+@pytest.fixture
+async def adv(client, user_headers):
+    """ID of a new advertisement of the USER with one comment"""
+    response = await client.post("/adv/", json={"title": "Test advertisement", "body": "body"},
+                                 headers=user_headers)
+    adv_id = response.json()["id"]
+    await client.post(f"/adv/{adv_id}/comments", json={"body": "Test comment"}, headers=user_headers)
+    yield adv_id
+    await client.delete(f"/adv/{adv_id}", headers=user_headers)
+
+
+@pytest.fixture
+async def comment(client, user_headers, adv):
+    """ID of the comment of the advertisement"""
+    response = await client.get(f"/adv/{adv}/comments")
+    return response.json()["items"][0]["id"]
+
+
+async def test_register(client, statements, throwaway_username):
+    response, count = await counted(statements, client.post(
+        "/auth/register", json={"username": throwaway_username, "password": TEST_PASSWORD}))
+    assert response.status_code == 201
+    assert count == 2
+
+
+async def test_delete_user(client, statements, admin_headers, throwaway_user):
+    token = (await login(client, throwaway_user))["access_token"]
+    # The job is saved and the user deactivated, then the background job
+    # saves its state, deactivates the user again, looks for comments and
+    # advertisements, deletes the user and saves the result. Both changes
+    # of the user are notified to other workers
+    response, count = await counted(statements, client.delete(
+        "/users/me", headers={"Authorization": f"Bearer {token}"}))
+    assert response.status_code == 202
+    assert count == 11
+    response, count = await counted(statements, client.get(f"/jobs/{response.json()['id']}",
+                                                           headers=admin_headers))
+    assert response.status_code == 200
+    assert response.json()["status"] == "DONE"
+    assert count == 1
+
+
+async def test_login(client, statements, tokens):
+    response, count = await counted(statements, client.post(
+        "/auth/login", data={"username": TEST_USERNAME, "password": TEST_PASSWORD}))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_refresh(client, statements, tokens):
+    refresh_token = tokens[TEST_ADMIN_USERNAME]["refresh_token"]
+    response, count = await counted(statements, client.post(
+        "/auth/refresh", json={"refresh_token": refresh_token}))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_read_user(client, statements, user_headers):
+    response, count = await counted(statements, client.get("/users/me", headers=user_headers))
+    assert response.status_code == 200
+    assert count == 2
+
+
+async def test_update_user(client, statements, user_headers):
+    # UPDATE, its advertisements and NOTIFY of other workers
+    response, count = await counted(statements, client.put(
+        "/users/me", json={"fullname": "Test User"}, headers=user_headers))
+    assert response.status_code == 200
+    assert count == 3
+
+
+async def test_list_users(client, statements, admin_headers):
+    response, count = await counted(statements, client.get("/users/list", headers=admin_headers))
+    assert response.status_code == 200
+    assert count == 2
+
+
+async def test_change_user(client, statements, admin_headers, throwaway_user):
+    # The change revokes tokens of the user, so it's made to another one.
+    # UPDATE, advertisements of the user and NOTIFY of other workers
+    response, count = await counted(statements, client.post(
+        "/users/change", json={"username": throwaway_user, "is_active": True}, headers=admin_headers))
+    assert response.status_code == 200
+    assert count == 3
+
+
+async def test_list_advs(client, statements, adv):
+    response, count = await counted(statements, client.get("/adv/"))
+    assert response.status_code == 200
+    assert count == 1
+    response, count = await counted(statements, client.get(
+        "/adv/", params={"limit": 1, "cursor": response.json()["next"]}))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_search_advs(client, statements, adv):
+    response, count = await counted(statements, client.get("/adv/search", params={"q": "test"}))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_export_advs(client, statements, admin_headers, adv):
+    response, count = await counted(statements, client.get("/adv/export", headers=admin_headers))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_export_advs_with_comments(client, statements, admin_headers, adv):
+    # Streams of advertisements and of comments merged into them
+    response, count = await counted(statements, client.get(
+        "/adv/export", params={"comments": True}, headers=admin_headers))
+    assert response.status_code == 200
+    assert count == 2
+
+
+async def test_read_adv(client, statements, adv):
+    response, count = await counted(statements, client.get(f"/adv/{adv}"))
+    assert response.status_code == 200
+    assert count == 1
+    response, count = await counted(statements, client.get(
+        f"/adv/{adv}", headers={"If-None-Match": response.headers["ETag"]}))
+    assert response.status_code == 304
+    assert count == 1
+
+
+async def test_create_adv(client, statements, user_headers):
+    response, count = await counted(statements, client.post(
+        "/adv/", json={"title": "Test advertisement"}, headers=user_headers))
+    assert response.status_code == 201
+    assert count == 1
+    await client.delete(f"/adv/{response.json()['id']}", headers=user_headers)
+
+
+async def test_update_adv(client, statements, user_headers, adv):
+    response, count = await counted(statements, client.put(
+        f"/adv/{adv}", json={"body": "changed"}, headers=user_headers))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_delete_adv(client, statements, user_headers, adv):
+    response, count = await counted(statements, client.delete(f"/adv/{adv}", headers=user_headers))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_list_comments(client, statements, adv):
+    # State of the thread for ETag and the page
+    response, count = await counted(statements, client.get(f"/adv/{adv}/comments"))
+    assert response.status_code == 200
+    assert count == 2
+    response, count = await counted(statements, client.get(
+        f"/adv/{adv}/comments", headers={"If-None-Match": response.headers["ETag"]}))
+    assert response.status_code == 304
+    assert count == 1
+
+
+async def test_create_comment(client, statements, user_headers, adv):
+    response, count = await counted(statements, client.post(
+        f"/adv/{adv}/comments", json={"body": "Another comment"}, headers=user_headers))
+    assert response.status_code == 201
+    assert count == 1
+
+
+async def test_update_comment(client, statements, user_headers, adv, comment):
+    response, count = await counted(statements, client.put(
+        f"/adv/{adv}/comments/{comment}", json={"body": "changed"}, headers=user_headers))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_delete_comment(client, statements, user_headers, adv, comment):
+    response, count = await counted(statements, client.delete(
+        f"/adv/{adv}/comments/{comment}", headers=user_headers))
+    assert response.status_code == 200
+    assert count == 1
+
+
+async def test_delete_group_comments(client, statements, admin_headers, adv):
+    # The job is saved, then the background job saves its state, reads the
+    # range of comment IDs, deletes the only batch and saves the result
+    response, count = await counted(statements, client.delete(
+        f"/adv/del_comments/{Group.SELLING_ADV.value}", headers=admin_headers))
+    assert response.status_code == 202
+    assert count == 5
+    response, count = await counted(statements, client.get(f"/jobs/{response.json()['id']}",
+                                                           headers=admin_headers))
+    assert response.status_code == 200
+    assert response.json()["status"] == "DONE"
+    assert response.json()["processed"] >= 1
+    assert count == 1